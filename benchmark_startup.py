@@ -0,0 +1,69 @@
+"""
+Startup benchmark - cold-start latency of each entry point
+Every case runs in a fresh interpreter, the way a short-lived CLI job or
+worker would, and reports the median wall time over several runs minus
+the cost of starting an empty interpreter.
+
+Usage:
+    python benchmark_startup.py [runs]
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+PERSONS_CARS = os.path.join(ROOT, 'persons_cars_ex_sqlit_csv_oop')
+
+# name -> (working directory, code to run)
+CASES = {
+    'python (baseline)': (ROOT, 'pass'),
+    'upload_csv import': (ROOT, 'import upload_csv'),
+    'EmployeeDB() new file': (ROOT, 'from example_csv_sqlite import EmployeeDB; EmployeeDB({db!r}).close()'),
+    'EmployeeDB() existing file': (ROOT, 'from example_csv_sqlite import EmployeeDB; EmployeeDB({db!r}).close()'),
+    'DatabaseManager new file': (PERSONS_CARS, 'import persons_cars_complete_solution as m; '
+                                               'db = m.DatabaseManager({db!r}); db.create_tables(); db.connection.close()'),
+    'DatabaseManager existing file': (PERSONS_CARS, 'import persons_cars_complete_solution as m; '
+                                                    'db = m.DatabaseManager({db!r}); db.create_tables(); db.connection.close()'),
+    'batch_mode import': (PERSONS_CARS, 'import batch_mode'),
+    'sharding import': (PERSONS_CARS, 'import sharding'),
+}
+
+
+def run_case(cwd, code, runs, fresh_db):
+    """Median wall time in ms, or None if the entry point cannot start here"""
+    times = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(runs):
+            # "new file" cases get a new database every run, the others reuse one
+            db = os.path.join(tmp, f'startup_{i if fresh_db else 0}.db')
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable, '-c', code.format(db=db)], cwd=cwd,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            elapsed = (time.perf_counter() - start) * 1000
+            if result.returncode != 0:
+                return None, result.stderr.decode(errors='replace').strip().splitlines()[-1]
+            if fresh_db or i > 0:
+                times.append(elapsed)
+    return statistics.median(times), None
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    baseline = None
+    print(f"{'entry point':<32}{'median (ms)':>12}{'over baseline':>16}")
+    for name, (cwd, code) in CASES.items():
+        median, error = run_case(cwd, code, runs, fresh_db='new file' in name)
+        if median is None:
+            print(f"{name:<32}{'skipped':>12}   ({error})")
+            continue
+        if baseline is None:
+            baseline = median
+        print(f"{name:<32}{median:>12.1f}{median - baseline:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
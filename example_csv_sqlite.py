@@ -1,13 +1,33 @@
 import sqlite3
 
+from persons_cars_ex_sqlit_csv_oop.query_monitor import QueryMonitor
+
 class EmployeeDB:
-    def __init__(self, db_name='employees.csv'):
-        self.conn = sqlite3.connect(db_name)
+    # SQL is built once; sqlite3 reuses the compiled statement for the same string
+    INSERT_EMPLOYEE = 'INSERT INTO employees (name, department, salary) VALUES (?, ?, ?)'
+    SELECT_ALL = 'SELECT * FROM employees'
+    SEARCH_BY_NAME = 'SELECT * FROM employees WHERE name LIKE ?'
+    UPDATE_SALARY = 'UPDATE employees SET salary = ? WHERE id = ?'
+    DELETE_EMPLOYEE = 'DELETE FROM employees WHERE id = ?'
+    SELECT_STATS = (
+        'SELECT COUNT(*) as total, AVG(salary) as avg_salary, '
+        'MIN(salary) as min_salary, MAX(salary) as max_salary FROM employees'
+    )
+    
+    def __init__(self, db_name='employees.csv', monitor=None):
+        self.conn = sqlite3.connect(db_name, cached_statements=256)
         self.cursor = self.conn.cursor()
-        self.create_table()
+        self.monitor = monitor if monitor is not None else QueryMonitor()
+        # Only the first connection to a file pays for the schema setup
+        if not self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'employees'").fetchone():
+            self.create_table()
+    
+    def execute(self, sql, params=(), fetch=None):
+        return self.monitor.execute(self.cursor, sql, params, fetch)
     
     def create_table(self):
-        self.cursor.execute('''
+        self.execute('''
             CREATE TABLE IF NOT EXISTS employees (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
@@ -18,48 +38,28 @@ class EmployeeDB:
         self.conn.commit()
     
     def add_employee(self, name, department, salary):
-        self.cursor.execute('''
-            INSERT INTO employees (name, department, salary)
-            VALUES (?, ?, ?)
-        ''', (name, department, salary))
+        self.execute(self.INSERT_EMPLOYEE, (name, department, salary))
         self.conn.commit()
         print(f"✓ Added {name}")
     
     def get_all(self):
-        self.cursor.execute('SELECT * FROM employees')
-        return self.cursor.fetchall()
+        return self.execute(self.SELECT_ALL, fetch='all')
     
     def search_by_name(self, name):
-        self.cursor.execute('''
-            SELECT * FROM employees 
-            WHERE name LIKE ?
-        ''', (f'%{name}%',))
-        return self.cursor.fetchall()
+        return self.execute(self.SEARCH_BY_NAME, (f'%{name}%',), fetch='all')
     
     def update_salary(self, employee_id, new_salary):
-        self.cursor.execute('''
-            UPDATE employees 
-            SET salary = ? 
-            WHERE id = ?
-        ''', (new_salary, employee_id))
+        self.execute(self.UPDATE_SALARY, (new_salary, employee_id))
         self.conn.commit()
         print(f"✓ Updated salary for ID {employee_id}")
     
     def delete_employee(self, employee_id):
-        self.cursor.execute('DELETE FROM employees WHERE id = ?', (employee_id,))
+        self.execute(self.DELETE_EMPLOYEE, (employee_id,))
         self.conn.commit()
         print(f"✓ Deleted employee ID {employee_id}")
     
     def get_stats(self):
-        self.cursor.execute('''
-            SELECT 
-                COUNT(*) as total,
-                AVG(salary) as avg_salary,
-                MIN(salary) as min_salary,
-                MAX(salary) as max_salary
-            FROM employees
-        ''')
-        return self.cursor.fetchone()
+        return self.execute(self.SELECT_STATS, fetch='one')
     
     def close(self):
         self.conn.close()
@@ -90,4 +90,7 @@ if __name__ == "__main__":
     total, avg, min_sal, max_sal = db.get_stats()
     print(f"\nStats: {total} employees, Avg: ${avg:,.0f}")
     
+    # Query metrics
+    print(db.monitor.to_prometheus())
+    
     db.close()
\ No newline at end of file
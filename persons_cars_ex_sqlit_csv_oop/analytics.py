@@ -0,0 +1,243 @@
+"""
+Analytics - Persons and Cars Management System
+Column-oriented, in-memory snapshot of persons and cars for ad-hoc analysis.
+
+The tables are read once in chunks into pandas DataFrames (brand, model
+and color as categoricals, numbers as small NumPy ints). Group-bys,
+histograms and joins then run vectorized instead of calling
+Car.get_age() per object.
+
+refresh() appends rows whose primary key is above the last one loaded.
+When the row counts show that rows were deleted it reloads everything;
+updates to rows already loaded need an explicit load().
+
+Requires numpy and pandas.
+
+Usage:
+    python analytics.py [db_name]         # print the analyses
+    python analytics.py --benchmark [N]   # vectorized vs per-object, N cars
+"""
+
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from persons_cars_complete_solution import Car, DatabaseManager
+
+
+# table -> (primary key, column -> dtype); 'category' columns are interned strings
+SNAPSHOT_COLUMNS = {
+    'persons': ('person_id', {'person_id': 'int64', 'name': 'object', 'age': 'int16', 'email': 'object'}),
+    'cars': ('car_id', {'car_id': 'int64', 'brand': 'category', 'model': 'category',
+                        'year': 'int16', 'color': 'category', 'owner_id': 'Int64'}),
+}
+
+
+def concat_chunks(chunks, dtypes):
+    """Concatenate DataFrame chunks, merging categoricals instead of falling back to object"""
+    if not chunks:
+        return pd.DataFrame({name: pd.Series(dtype=dtype) for name, dtype in dtypes.items()})
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for name, dtype in dtypes.items():
+        if dtype == 'category':
+            columns[name] = union_categoricals([chunk[name] for chunk in chunks])
+        elif dtype == 'Int64':
+            columns[name] = pd.concat([chunk[name] for chunk in chunks], ignore_index=True)
+        else:
+            columns[name] = np.concatenate([chunk[name].to_numpy() for chunk in chunks])
+    return pd.DataFrame(columns)
+
+
+class AnalyticsSnapshot:
+    """Reusable in-memory copy of persons and cars in column form"""
+
+    def __init__(self, db_manager, chunk_size=500000):
+        self.db_manager = db_manager
+        self.chunk_size = chunk_size
+        self.frames = {}
+        self.last_key = {}
+
+    @property
+    def persons(self):
+        return self.frames['persons']
+
+    @property
+    def cars(self):
+        return self.frames['cars']
+
+    # ---------- loading ----------
+
+    def read_table(self, table, after_key=None):
+        """Read a table (or its rows past after_key) in chunks through the query monitor"""
+        key, dtypes = SNAPSHOT_COLUMNS[table]
+        sql = f'SELECT {", ".join(dtypes)} FROM {table}'
+        params = ()
+        if after_key is not None:
+            sql += f' WHERE {key} > ?'
+            params = (after_key,)
+        sql += f' ORDER BY {key}'
+
+        start = time.perf_counter()
+        cursor = self.db_manager.connection.execute(sql, params)
+        chunks = []
+        while rows := cursor.fetchmany(self.chunk_size):
+            chunks.append(pd.DataFrame.from_records(rows, columns=list(dtypes)).astype(dtypes))
+        cursor.close()
+        frame = concat_chunks(chunks, dtypes)
+        self.db_manager.monitor.record(None, sql, params, time.perf_counter() - start, len(frame))
+        return frame
+
+    def load(self):
+        """Load both tables from scratch"""
+        for table, (key, _) in SNAPSHOT_COLUMNS.items():
+            self.frames[table] = frame = self.read_table(table)
+            self.last_key[table] = int(frame[key].iloc[-1]) if len(frame) else None
+        return self
+
+    def refresh(self):
+        """Append new rows; reload a table whose rows were deleted"""
+        if not self.frames:
+            return self.load()
+        for table, (key, dtypes) in SNAPSHOT_COLUMNS.items():
+            last = self.last_key[table]
+            new = self.read_table(table, last) if last is not None else self.read_table(table)
+            frame = concat_chunks([self.frames[table], new], dtypes) if len(new) else self.frames[table]
+            count = self.db_manager.execute(f'SELECT COUNT(*) FROM {table}', fetch='one')[0]
+            if count != len(frame):
+                frame = self.read_table(table)
+            self.frames[table] = frame
+            self.last_key[table] = int(frame[key].iloc[-1]) if len(frame) else None
+        return self
+
+    # ---------- analyses ----------
+
+    def car_ages(self):
+        """Car.get_age() for every car as one array"""
+        return datetime.now().year - self.cars['year'].to_numpy()
+
+    def car_age_histogram(self):
+        """Number of cars per age in years"""
+        ages = self.car_ages()
+        if not len(ages):
+            return pd.Series(dtype='int64')
+        offset = min(int(ages.min()), 0)
+        counts = np.bincount(ages - offset)
+        index = np.arange(offset, offset + len(counts))
+        return pd.Series(counts, index=index, name='cars')[counts > 0]
+
+    def brand_by_year(self):
+        """Brand x year table of car counts"""
+        brands = self.cars['brand'].cat
+        years = self.cars['year'].to_numpy()
+        if not len(years):
+            return pd.DataFrame()
+        first = int(years.min())
+        span = int(years.max()) - first + 1
+        # The grid is small and dense: one bincount over (brand, year) cell
+        # numbers is far cheaper than a hash group-by
+        cells = brands.codes.to_numpy().astype('int64') * span + (years - first)
+        counts = np.bincount(cells, minlength=len(brands.categories) * span).reshape(-1, span)
+        table = pd.DataFrame(counts, index=pd.Index(brands.categories, name='brand'),
+                             columns=pd.RangeIndex(first, first + span, name='year'))
+        return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+
+    def brand_counts(self):
+        return self.cars['brand'].value_counts()
+
+    def color_counts(self):
+        return self.cars['color'].value_counts()
+
+    def cars_with_owners(self):
+        """Cars joined with their owner's name and age (left join: unowned cars keep NaN)"""
+        owners = self.persons[['person_id', 'name', 'age']].rename(
+            columns={'person_id': 'owner_id', 'name': 'owner_name', 'age': 'owner_age'})
+        owners['owner_id'] = owners['owner_id'].astype('Int64')
+        return self.cars.merge(owners, on='owner_id', how='left')
+
+    def age_buckets_per_owner(self, bucket_size=10):
+        """Persons, cars and cars per person for each owner age bucket"""
+        cars_per_owner = self.cars['owner_id'].value_counts()
+        persons = self.persons
+        cars = persons['person_id'].map(cars_per_owner).fillna(0).astype('int64')
+        buckets = (persons['age'].to_numpy() // bucket_size) * bucket_size
+        table = pd.DataFrame({'bucket': buckets, 'cars': cars.to_numpy()})
+        result = table.groupby('bucket')['cars'].agg(persons='size', cars='sum', cars_per_person='mean')
+        result.index = [f'{b}-{b + bucket_size - 1}' for b in result.index]
+        return result
+
+    def average_car_age_by_owner_age(self, bucket_size=10):
+        """Join cars to owners and average car age per owner age bucket"""
+        joined = self.cars_with_owners().dropna(subset=['owner_age'])
+        buckets = (joined['owner_age'].to_numpy().astype('int64') // bucket_size) * bucket_size
+        ages = datetime.now().year - joined['year'].to_numpy()
+        return pd.Series(ages).groupby(buckets).mean().rename('average_car_age')
+
+    def print_report(self):
+        """Print every analysis"""
+        print("\n" + "="*60)
+        print(f"🔬 ANALYTICS ({len(self.persons)} persons, {len(self.cars)} cars)")
+        print("="*60)
+        for title, result in (
+            ("🚗 Cars per brand and year", self.brand_by_year()),
+            ("📅 Car age histogram", self.car_age_histogram()),
+            ("👥 Owner age buckets", self.age_buckets_per_owner()),
+            ("🔗 Average car age by owner age", self.average_car_age_by_owner_age()),
+        ):
+            print(f"\n{title}:")
+            print(result.to_string())
+        print("="*60 + "\n")
+
+
+# ========================================
+# Benchmark
+# ========================================
+
+def benchmark(cars_count=10_000_000):
+    """Compare per-object Car.get_age() loops with the vectorized snapshot"""
+    brands = ['Toyota', 'Honda', 'Mazda', 'Ford', 'Kia', 'Hyundai']
+    colors = ['White', 'Black', 'Silver', 'Red', 'Blue']
+    cars = [Car(i, brands[i % 6], 'Model', 1990 + i % 34, colors[i % 5], i % 100000)
+            for i in range(cars_count)]
+
+    snapshot = AnalyticsSnapshot(None)
+    snapshot.frames['cars'] = pd.DataFrame({
+        'car_id': np.arange(cars_count, dtype='int64'),
+        'brand': pd.Categorical([c.brand for c in cars]),
+        'year': np.array([c.year for c in cars], dtype='int16'),
+    })
+
+    def per_object():
+        histogram = {}
+        by_brand_year = {}
+        for car in cars:
+            age = car.get_age()
+            histogram[age] = histogram.get(age, 0) + 1
+            key = (car.brand, car.year)
+            by_brand_year[key] = by_brand_year.get(key, 0) + 1
+        return histogram, by_brand_year
+
+    def vectorized():
+        return snapshot.car_age_histogram(), snapshot.brand_by_year()
+
+    results = {}
+    for name, func in (('per-object loop', per_object), ('vectorized', vectorized)):
+        start = time.perf_counter()
+        func()
+        results[name] = time.perf_counter() - start
+        print(f"   {name:<16} {results[name]:.3f}s")
+    print(f"   speedup: {results['per-object loop'] / results['vectorized']:.1f}x on {cars_count:,} cars")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 10_000_000)
+    else:
+        db = DatabaseManager(sys.argv[1] if len(sys.argv) > 1 else 'persons_cars.db')
+        AnalyticsSnapshot(db).load().print_report()
+        db.close()
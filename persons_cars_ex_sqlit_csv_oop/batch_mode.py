@@ -0,0 +1,285 @@
+"""
+Batch Mode - Persons and Cars Management System
+Replays a file of commands without the interactive menu.
+
+Command file format (one CSV line per command, '#' starts a comment):
+    add_person,1,David Cohen,35,david@example.com
+    add_car,1,Toyota,Corolla,2020,White,1
+    update_person,1,David Cohen,36,david@example.com
+    delete_person,1
+    export,nightly
+    stats
+    stats,approx        # sketch-based report, answered from memory
+
+Usage:
+    python batch_mode.py commands.txt [db_name]
+"""
+
+import csv
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+
+from persons_cars_complete_solution import CSVManager, DatabaseManager, StatisticsManager, Statements
+from sketches import ApproximateStatistics
+
+
+# ========================================
+# Command Parsing
+# ========================================
+
+def parse_person(args):
+    """add_person,person_id,name,age,email"""
+    return (int(args[0]), args[1], int(args[2]), args[3])
+
+
+def parse_car(args):
+    """add_car,car_id,brand,model,year,color[,owner_id]"""
+    owner_id = int(args[5]) if len(args) > 5 and args[5] else None
+    return (int(args[0]), args[1], args[2], int(args[3]), args[4], owner_id)
+
+
+def parse_update(args):
+    """update_person,person_id,name,age,email"""
+    return (args[1], int(args[2]), args[3], int(args[0]))
+
+
+def parse_delete(args):
+    """delete_person,person_id"""
+    return (int(args[0]),)
+
+
+# command -> (statements to run, argument parser)
+WRITE_COMMANDS = {
+    'add_person': ((Statements.INSERT_PERSON,), parse_person),
+    'add_car': ((Statements.INSERT_CAR,), parse_car),
+    'update_person': ((Statements.UPDATE_PERSON,), parse_update),
+    'delete_person': ((Statements.DELETE_CARS_BY_OWNER, Statements.DELETE_PERSON), parse_delete),
+}
+
+BACKGROUND_COMMANDS = ('export', 'stats')
+
+# insert command -> table whose observers get the inserted rows
+INSERT_TABLES = {'add_person': 'persons', 'add_car': 'cars'}
+# update/delete command -> tables whose observers are told that rows changed
+CHANGE_TABLES = {'update_person': ('persons',), 'delete_person': ('cars', 'persons')}
+
+
+# ========================================
+# Background Jobs
+# ========================================
+
+def export_job(db_name, prefix):
+    """Export persons, cars and the full report from a consistent snapshot"""
+    db = DatabaseManager(db_name)
+    # One read transaction so every file sees the same data
+    db.connection.execute('BEGIN')
+    CSVManager.export_persons_to_csv(db.get_all_persons(), f'{prefix}_persons.csv')
+    CSVManager.export_cars_to_csv(db.get_all_cars(), f'{prefix}_cars.csv')
+    CSVManager.export_full_report(db, f'{prefix}_full_report.csv')
+    db.close()
+
+
+def stats_job(db_name):
+    """Print the statistics report"""
+    db = DatabaseManager(db_name)
+    StatisticsManager(db).print_statistics()
+    db.close()
+
+
+# ========================================
+# Batch Processor
+# ========================================
+
+class BatchProcessor:
+    """Runs a command file through a read -> write -> background pipeline"""
+
+    _DONE = object()
+
+    def __init__(self, db_name='persons_cars.db', transaction_size=10000, chunk_size=1000, sketches=True):
+        self.db_name = db_name
+        self.transaction_size = transaction_size
+        self.chunk_size = chunk_size
+        self.sketches = sketches
+        self.errors = []
+        self.applied = 0
+        # Set when the command file could not be read to the end
+        self.truncated = False
+
+    def read_commands(self, filename, chunks):
+        """Reader stage: parse the file into chunks of (line_no, command, params)"""
+        chunk = []
+        reader = None
+        try:
+            with open(filename, 'r', encoding='utf-8') as file:
+                reader = csv.reader(file)
+                for args in reader:
+                    line_no = reader.line_num
+                    if not args or args[0].lstrip().startswith('#'):
+                        continue
+                    command = args[0].strip()
+                    try:
+                        if command in WRITE_COMMANDS:
+                            params = WRITE_COMMANDS[command][1](args[1:])
+                        elif command in BACKGROUND_COMMANDS:
+                            params = args[1:]
+                        else:
+                            raise ValueError(f"unknown command '{command}'")
+                    except (ValueError, IndexError) as e:
+                        self.errors.append((line_no, f"{command}: {e}"))
+                        continue
+                    chunk.append((line_no, command, params))
+                    if len(chunk) >= self.chunk_size:
+                        chunks.put(chunk)
+                        chunk = []
+        except (OSError, UnicodeDecodeError, csv.Error) as e:
+            # Everything after the bad line is skipped: report the replay as truncated
+            self.truncated = True
+            last_line = reader.line_num if reader else 0
+            self.errors.append((last_line, f"cannot read {filename} past line {last_line}: {e}"))
+        finally:
+            if chunk:
+                chunks.put(chunk)
+            chunks.put(self._DONE)
+
+    def flush(self, db, pending):
+        """Writer stage: apply pending writes in one transaction"""
+        if not pending:
+            return
+        inserted = []
+        changed = set()
+        db.connection.execute('BEGIN')
+        # Consecutive commands of the same kind become one executemany call
+        for command, group in groupby(pending, key=lambda op: op[1]):
+            group = list(group)
+            statements = WRITE_COMMANDS[command][0]
+            db.connection.execute('SAVEPOINT batch_group')
+            try:
+                for sql in statements:
+                    db.executemany(sql, [op[2] for op in group])
+            except sqlite3.Error:
+                # Replay the group one by one to find the failing lines
+                db.connection.execute('ROLLBACK TO batch_group')
+                group = self.apply_one_by_one(db, group, statements)
+            db.connection.execute('RELEASE batch_group')
+            self.applied += len(group)
+            if command in INSERT_TABLES:
+                inserted.append((INSERT_TABLES[command], [op[2] for op in group]))
+            elif group:
+                changed.update(CHANGE_TABLES[command])
+        db.connection.commit()
+        for table, rows in inserted:
+            db.notify_inserted(table, rows)
+        for table in changed:
+            db.notify_changed(table)
+        pending.clear()
+
+    def apply_one_by_one(self, db, group, statements):
+        """Apply each command separately and return the ones that succeeded"""
+        applied = []
+        for line_no, command, params in group:
+            # delete_person runs two statements: undo both if either fails
+            db.connection.execute('SAVEPOINT batch_command')
+            try:
+                for sql in statements:
+                    db.execute(sql, params)
+                applied.append((line_no, command, params))
+            except sqlite3.Error as e:
+                db.connection.execute('ROLLBACK TO batch_command')
+                self.errors.append((line_no, f"{command}: {e}"))
+            db.connection.execute('RELEASE batch_command')
+        return applied
+
+    def run(self, filename):
+        """Replay a command file and return a summary"""
+        start = time.perf_counter()
+        db = DatabaseManager(self.db_name)
+        db.create_tables()
+        # WAL lets background readers work while the writer keeps committing
+        db.execute('PRAGMA journal_mode=WAL', fetch='one')
+        db.execute('PRAGMA synchronous=NORMAL')
+        # Summaries are rebuilt in one pass instead of by per-row triggers
+        db.drop_summary_triggers()
+        db.connection.commit()
+        approx = ApproximateStatistics(db).load_or_rebuild() if self.sketches else None
+
+        chunks = queue.Queue(maxsize=16)
+        reader = threading.Thread(target=self.read_commands, args=(filename, chunks), daemon=True)
+        reader.start()
+
+        pending = []
+        jobs = []
+        with ThreadPoolExecutor(max_workers=1) as background:
+            while True:
+                chunk = chunks.get()
+                if chunk is self._DONE:
+                    break
+                for op in chunk:
+                    command = op[1]
+                    if command in WRITE_COMMANDS:
+                        pending.append(op)
+                        if len(pending) >= self.transaction_size:
+                            self.flush(db, pending)
+                    else:
+                        # Background jobs must see every write before them
+                        self.flush(db, pending)
+                        if command == 'export':
+                            prefix = op[2][0] if op[2] else 'batch'
+                            jobs.append(background.submit(export_job, self.db_name, prefix))
+                        elif approx and op[2][:1] == ['approx']:
+                            approx.print_statistics()
+                        else:
+                            db.refresh_summaries()
+                            jobs.append(background.submit(stats_job, self.db_name))
+            self.flush(db, pending)
+
+        db.create_tables()
+        db.connection.commit()
+        if approx:
+            approx.save()
+
+        for job in jobs:
+            if job.exception():
+                self.errors.append((0, f"background job failed: {job.exception()}"))
+        reader.join()
+        db.close()
+
+        elapsed = time.perf_counter() - start
+        summary = {
+            'applied': self.applied,
+            'errors': len(self.errors),
+            'background_jobs': len(jobs),
+            'truncated': self.truncated,
+            'seconds': elapsed
+        }
+        self.print_summary(summary)
+        return summary
+
+    def print_summary(self, summary):
+        """Print the result of the batch run"""
+        print("\n" + "="*60)
+        print("📦 BATCH SUMMARY")
+        print("="*60)
+        print(f"   Applied commands: {summary['applied']}")
+        print(f"   Background jobs: {summary['background_jobs']}")
+        print(f"   Errors: {summary['errors']}")
+        if summary['truncated']:
+            print("   ❌ Replay stopped early: the rest of the command file was not applied")
+        for line_no, message in sorted(self.errors)[:20]:
+            print(f"   ❌ line {line_no}: {message}")
+        rate = summary['applied'] / summary['seconds'] if summary['seconds'] else 0
+        print(f"   Time: {summary['seconds']:.2f}s ({rate:,.0f} commands/s)")
+        print("="*60 + "\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    db_name = sys.argv[2] if len(sys.argv) > 2 else 'persons_cars.db'
+    summary = BatchProcessor(db_name).run(sys.argv[1])
+    sys.exit(1 if summary['truncated'] else 0)
@@ -0,0 +1,109 @@
+"""
+Microbenchmark - per-call overhead of the hot CRUD methods
+Compares the original inline SQL + positional row building with the
+Statements registry + row-factory mapping used by DatabaseManager.
+"""
+
+import timeit
+
+from persons_cars_complete_solution import Car, DatabaseManager, Person, Statements
+from query_monitor import QueryMonitor
+
+
+PERSONS = 200
+CARS_PER_PERSON = 5
+REPEAT = 5
+
+
+def build_manager():
+    """In-memory database filled with sample data"""
+    db = DatabaseManager(':memory:', monitor=QueryMonitor(slow_query_threshold=float('inf')))
+    db.cursor.execute('CREATE TABLE persons (person_id INTEGER PRIMARY KEY, name TEXT, age INTEGER, email TEXT)')
+    db.cursor.execute('CREATE TABLE cars (car_id INTEGER PRIMARY KEY, brand TEXT, model TEXT, '
+                      'year INTEGER, color TEXT, owner_id INTEGER)')
+    db.cursor.execute('CREATE INDEX idx_cars_owner ON cars(owner_id)')
+    for person_id in range(1, PERSONS + 1):
+        db.cursor.execute('INSERT INTO persons VALUES (?, ?, ?, ?)',
+                          (person_id, f'Person {person_id}', 30, f'p{person_id}@example.com'))
+        for i in range(CARS_PER_PERSON):
+            car_id = person_id * CARS_PER_PERSON + i
+            db.cursor.execute('INSERT INTO cars VALUES (?, ?, ?, ?, ?, ?)',
+                              (car_id, 'Toyota', 'Corolla', 2020, 'White', person_id))
+    db.connection.commit()
+    return db
+
+
+# ----- "before": the previous method bodies (inline SQL, positional rows) -----
+
+def old_get_cars_by_owner(db, owner_id):
+    rows = db.execute('SELECT * FROM cars WHERE owner_id = ?', (owner_id,), fetch='all')
+    cars = []
+    for row in rows:
+        car = Car(row[0], row[1], row[2], row[3], row[4], row[5])
+        cars.append(car)
+    return cars
+
+
+def old_insert_car(db, car):
+    db.execute('''
+        INSERT INTO cars (car_id, brand, model, year, color, owner_id)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (car.car_id, car.brand, car.model, car.year, car.color, car.owner_id))
+    db.connection.commit()
+
+
+def old_get_person_by_id(db, person_id):
+    row = db.execute('SELECT * FROM persons WHERE person_id = ?', (person_id,), fetch='one')
+    return Person(row[0], row[1], row[2], row[3]) if row else None
+
+
+# ----- "after": DatabaseManager internals without the print() noise -----
+
+def new_get_cars_by_owner(db, owner_id):
+    return db.get_cars_by_owner(owner_id)
+
+
+def new_insert_car(db, car):
+    db.execute(Statements.INSERT_CAR, (car.car_id, car.brand, car.model, car.year, car.color, car.owner_id))
+    db.connection.commit()
+
+
+def new_get_person_by_id(db, person_id):
+    return db.execute(Statements.SELECT_PERSON_BY_ID, (person_id,), fetch='one', cursor=db.person_cursor)
+
+
+def per_call_us(func, number):
+    """Best-of-REPEAT time per call in microseconds"""
+    return min(timeit.repeat(func, number=number, repeat=REPEAT)) / number * 1_000_000
+
+
+def main():
+    db = build_manager()
+    old_db = build_manager()
+
+    counter = iter(range(10_000_000, 20_000_000))
+
+    cases = [
+        ('get_cars_by_owner',
+         lambda: old_get_cars_by_owner(old_db, 42),
+         lambda: new_get_cars_by_owner(db, 42),
+         2000),
+        ('get_person_by_id',
+         lambda: old_get_person_by_id(old_db, 42),
+         lambda: new_get_person_by_id(db, 42),
+         5000),
+        ('insert_car',
+         lambda: old_insert_car(old_db, Car(next(counter), 'Kia', 'Rio', 2021, 'Red', 1)),
+         lambda: new_insert_car(db, Car(next(counter), 'Kia', 'Rio', 2021, 'Red', 1)),
+         2000),
+    ]
+
+    print(f"{'method':<20}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, before, after, number in cases:
+        before_us = per_call_us(before, number)
+        after_us = per_call_us(after, number)
+        print(f"{name:<20}{before_us:>14.2f}{after_us:>14.2f}{before_us / after_us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Parallel Export - Persons and Cars Management System
+Exports large tables to CSV shards with one worker process per key range.
+
+The table is split into primary-key ranges: equal widths of MIN..MAX by
+default, or equal row counts with --balanced (one extra pass over the
+table, for keys with large gaps). Every worker opens its own read-only
+connection, writes one shard (with a header, so each shard can be
+imported on its own) and returns its row count and SHA-256. A JSON
+manifest lists the shards; merge_shards() verifies them and concatenates
+them into one CSV.
+
+Workers read with separate connections, so export a database that is not
+being written to if the shards must form one consistent snapshot.
+
+Usage:
+    python parallel_export.py [db_name] [workers] [--merge] [--balanced]
+"""
+
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+from persons_cars_complete_solution import Statements
+
+
+# table -> (primary key, columns), same column order as CSVManager
+EXPORT_TABLES = {
+    'persons': ('person_id', Statements.PERSON_COLUMNS),
+    'cars': ('car_id', Statements.CAR_COLUMNS),
+}
+
+
+def connect_read_only(db_name):
+    """Open a database read-only (fails instead of creating a missing file)"""
+    return sqlite3.connect(f'file:{quote(os.path.abspath(db_name))}?mode=ro', uri=True)
+
+
+def split_ranges(connection, table, key, parts, balanced=False):
+    """Split a table into [low, high) ranges of its integer primary key.
+
+    By default MIN..MAX of the key is cut into equal widths. With
+    balanced=True every range holds about the same number of rows, for
+    keys with large gaps.
+    """
+    # Separate queries: SQLite only answers a lone MIN() or MAX() from the
+    # end of the B-tree; together they would scan the whole table
+    low = connection.execute(f'SELECT MIN({key}) FROM {table}').fetchone()[0]
+    high = connection.execute(f'SELECT MAX({key}) FROM {table}').fetchone()[0]
+    if low is None:
+        return [(None, None)]
+    if balanced:
+        total = connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        step = -(-total // parts)
+        inner = []
+        for _ in range(parts - 1):
+            # The key is the rowid, so OFFSET steps through the table B-tree
+            # row by row. Starting at the previous boundary makes all the
+            # steps together one pass over the table.
+            row = connection.execute(f'SELECT {key} FROM {table} WHERE {key} >= ? '
+                                     f'ORDER BY {key} LIMIT 1 OFFSET ?',
+                                     (inner[-1] if inner else low, step)).fetchone()
+            if row is None:
+                break
+            inner.append(row[0])
+    else:
+        inner = sorted({low + (high - low + 1) * i // parts for i in range(1, parts)} - {low})
+    bounds = [None] + inner + [None]
+    return list(zip(bounds, bounds[1:]))
+
+
+def export_range(db_name, table, low, high, filename, chunk_size=10000):
+    """Write the rows of one key range to a CSV shard (runs in a worker process)"""
+    key, columns = EXPORT_TABLES[table]
+    conditions, params = [], []
+    if low is not None:
+        conditions.append(f'{key} >= ?')
+        params.append(low)
+    if high is not None:
+        conditions.append(f'{key} < ?')
+        params.append(high)
+    sql = f'SELECT {columns} FROM {table}'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += f' ORDER BY {key}'
+
+    connection = connect_read_only(db_name)
+    cursor = connection.execute(sql, params)
+    digest = hashlib.sha256()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns.split(', '))
+    rows = 0
+    with open(filename, 'wb') as file:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            writer.writerows(chunk)
+            rows += len(chunk)
+            data = buffer.getvalue().encode('utf-8')
+            digest.update(data)
+            file.write(data)
+            buffer.seek(0)
+            buffer.truncate()
+            if not chunk:
+                break
+    connection.close()
+    return {'file': os.path.basename(filename), 'low': low, 'high': high,
+            'rows': rows, 'sha256': digest.hexdigest()}
+
+
+def file_sha256(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        while data := file.read(1 << 20):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def export_table(db_name, table, prefix=None, workers=None, shards=None, merge=False, balanced=False):
+    """Export one table to CSV shards in parallel and write its manifest"""
+    workers = workers or os.cpu_count()
+    prefix = prefix or table
+    key, columns = EXPORT_TABLES[table]
+    start = time.perf_counter()
+
+    connection = connect_read_only(db_name)
+    ranges = split_ranges(connection, table, key, shards or workers, balanced)
+    connection.close()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(export_range, db_name, table, low, high, f'{prefix}_part{i:03d}.csv')
+                   for i, (low, high) in enumerate(ranges)]
+        parts = [future.result() for future in futures]
+
+    manifest = {
+        'database': os.path.abspath(db_name),
+        'table': table,
+        'columns': columns.split(', '),
+        'rows': sum(part['rows'] for part in parts),
+        'shards': parts,
+    }
+    manifest_name = f'{prefix}_manifest.json'
+    with open(manifest_name, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    print(f"✅ {manifest['rows']} {table} rows exported to {len(parts)} shards "
+          f"in {time.perf_counter() - start:.2f}s ({manifest_name})")
+
+    if merge:
+        merge_shards(manifest_name)
+    return manifest
+
+
+def merge_shards(manifest_name, filename=None, verify=True):
+    """Concatenate the shards of a manifest into one CSV with a single header"""
+    directory = os.path.dirname(os.path.abspath(manifest_name))
+    with open(manifest_name, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    filename = filename or os.path.join(directory, f"{manifest['table']}.csv")
+
+    digest = hashlib.sha256()
+    with open(filename, 'wb') as output:
+        for i, part in enumerate(manifest['shards']):
+            path = os.path.join(directory, part['file'])
+            if verify and file_sha256(path) != part['sha256']:
+                raise ValueError(f"checksum mismatch in {part['file']}")
+            with open(path, 'rb') as shard:
+                header = shard.readline()
+                if i == 0:
+                    output.write(header)
+                    digest.update(header)
+                while data := shard.read(1 << 20):
+                    output.write(data)
+                    digest.update(data)
+
+    manifest['merged'] = {'file': os.path.basename(filename), 'sha256': digest.hexdigest()}
+    with open(manifest_name, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    print(f"✅ {len(manifest['shards'])} shards merged into {filename}")
+    return filename
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db_name = args[0] if args else 'persons_cars.db'
+    workers = int(args[1]) if len(args) > 1 else None
+    for table in EXPORT_TABLES:
+        export_table(db_name, table, workers=workers, merge='--merge' in sys.argv,
+                     balanced='--balanced' in sys.argv)
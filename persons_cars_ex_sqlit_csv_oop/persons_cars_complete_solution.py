@@ -5,8 +5,17 @@ OOP + SQLite3 + CSV
 
 import sqlite3
 import csv
+import builtins
+import functools
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
 from datetime import datetime
 
+from query_monitor import QueryMonitor
+
 
 # ========================================
 # Part 1: Classes Definition
@@ -22,13 +31,18 @@ class Person:
         self.email = email
         self.cars = []
     
+    @classmethod
+    def from_row(cls, cursor, row):
+        """Row factory: build a Person straight from a cursor row"""
+        return cls(*row)
+    
     def add_car(self, car):
         """Add a car to person's cars list"""
         self.cars.append(car)
         car.owner_id = self.person_id
     
     def get_cars_count(self):
-        """Return the number of cars owned"""
+        """Return the number of cars owned (a lazy cars list answers without loading)"""
         return len(self.cars)
     
     def __str__(self):
@@ -60,6 +74,11 @@ class Car:
         self.color = color
         self.owner_id = owner_id
     
+    @classmethod
+    def from_row(cls, cursor, row):
+        """Row factory: build a Car straight from a cursor row"""
+        return cls(*row)
+    
     def get_age(self):
         """Calculate car age"""
         current_year = datetime.now().year
@@ -89,19 +108,186 @@ class Car:
 # Part 2: Database Manager
 # ========================================
 
+class Statements:
+    """Registry of the SQL used by DatabaseManager, built once at import time.
+    
+    Passing the very same string object on every call lets sqlite3 find the
+    compiled statement in its cache instead of parsing the SQL again.
+    """
+    
+    PERSON_COLUMNS = 'person_id, name, age, email'
+    CAR_COLUMNS = 'car_id, brand, model, year, color, owner_id'
+    
+    INSERT_PERSON = f'INSERT INTO persons ({PERSON_COLUMNS}) VALUES (?, ?, ?, ?)'
+    INSERT_CAR = f'INSERT INTO cars ({CAR_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)'
+    SELECT_ALL_PERSONS = f'SELECT {PERSON_COLUMNS} FROM persons'
+    SELECT_ALL_CARS = f'SELECT {CAR_COLUMNS} FROM cars'
+    SELECT_PERSON_BY_ID = f'SELECT {PERSON_COLUMNS} FROM persons WHERE person_id = ?'
+    SELECT_CARS_BY_OWNER = f'SELECT {CAR_COLUMNS} FROM cars WHERE owner_id = ?'
+    SELECT_CARS_OLDER_THAN = f'SELECT {CAR_COLUMNS} FROM cars WHERE year < ?'
+    SELECT_PERSONS_BY_AGE = f'SELECT {PERSON_COLUMNS} FROM persons WHERE age BETWEEN ? AND ?'
+    UPDATE_PERSON = 'UPDATE persons SET name = ?, age = ?, email = ? WHERE person_id = ?'
+    DELETE_CARS_BY_OWNER = 'DELETE FROM cars WHERE owner_id = ?'
+    DELETE_PERSON = 'DELETE FROM persons WHERE person_id = ?'
+
+
+class CarLoader:
+    """Loads cars (or car counts) for a group of persons, batch_size owners per query.
+    
+    Touching one person's cars also loads the cars of the next persons in the
+    group, so iterating many persons costs one query per batch instead of one
+    query per person.
+    """
+    
+    def __init__(self, db_manager, owner_ids, batch_size):
+        self.db_manager = db_manager
+        self.owner_ids = owner_ids
+        self.positions = {owner_id: i for i, owner_id in enumerate(owner_ids)}
+        self.batch_size = batch_size
+        # The IN list is padded with NULLs so the SQL text never changes
+        placeholders = ', '.join('?' * batch_size)
+        self.cars_sql = f'SELECT {Statements.CAR_COLUMNS} FROM cars WHERE owner_id IN ({placeholders})'
+        self.counts_sql = f'SELECT owner_id, car_count FROM owner_car_counts WHERE owner_id IN ({placeholders})'
+        self.cars = {}
+        self.counts = {}
+    
+    def window(self, owner_id, done):
+        """Owner ids from owner_id onwards that are not loaded yet"""
+        start = self.positions[owner_id]
+        ids = [oid for oid in self.owner_ids[start:start + self.batch_size] if oid not in done]
+        return ids + [None] * (self.batch_size - len(ids))
+    
+    def load(self, owner_id):
+        """Return the cars of owner_id, prefetching the following owners"""
+        if owner_id not in self.cars:
+            window = self.window(owner_id, self.cars)
+            cars = self.db_manager.execute(self.cars_sql, window, fetch='all',
+                                           cursor=self.db_manager.car_cursor)
+            for oid in window:
+                if oid is not None:
+                    self.cars[oid] = []
+            for car in cars:
+                self.cars[car.owner_id].append(car)
+        # The LazyCars list keeps them from now on
+        return self.cars.pop(owner_id)
+    
+    def count(self, owner_id):
+        """Return the number of cars of owner_id without building Car objects"""
+        if owner_id in self.cars:
+            return len(self.cars[owner_id])
+        if owner_id not in self.counts:
+            window = self.window(owner_id, self.counts)
+            rows = self.db_manager.execute(self.counts_sql, window, fetch='all')
+            for oid in window:
+                if oid is not None:
+                    self.counts[oid] = 0
+            self.counts.update(rows)
+        return self.counts[owner_id]
+
+
+class LazyCars:
+    """A person's cars list that queries the database on first access"""
+    
+    def __init__(self, loader, owner_id):
+        self._loader = loader
+        self._owner_id = owner_id
+        self._cars = None
+    
+    @property
+    def loaded(self):
+        return self._cars is not None
+    
+    def _load(self):
+        if self._cars is None:
+            self._cars = self._loader.load(self._owner_id)
+        return self._cars
+    
+    def append(self, car):
+        self._load().append(car)
+    
+    def __iter__(self):
+        return iter(self._load())
+    
+    def __getitem__(self, index):
+        return self._load()[index]
+    
+    def __contains__(self, car):
+        return car in self._load()
+    
+    def __len__(self):
+        if self._cars is not None:
+            return len(self._cars)
+        return self._loader.count(self._owner_id)
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    def __repr__(self):
+        if self._cars is None:
+            return f"<LazyCars owner={self._owner_id} not loaded>"
+        return repr(self._cars)
+
+
 class DatabaseManager:
     """Manages all database operations for persons and cars"""
     
-    def __init__(self, db_name='persons_cars.db'):
+    CACHED_STATEMENTS = 256
+    PREFETCH_SIZE = 100
+    # Everything create_tables() sets up; the file is ready when all of them exist
+    SCHEMA_OBJECTS = ('persons', 'cars', 'idx_cars_owner',
+                      'owner_car_counts', 'brand_counts', 'color_counts',
+                      'cars_summary_insert', 'cars_summary_delete', 'cars_summary_update')
+    
+    def __init__(self, db_name='persons_cars.db', monitor=None, check_same_thread=True):
         """Initialize database connection"""
         self.db_name = db_name
-        self.connection = sqlite3.connect(db_name)
+        self.connection = sqlite3.connect(db_name, cached_statements=self.CACHED_STATEMENTS,
+                                          check_same_thread=check_same_thread)
         self.cursor = self.connection.cursor()
+        # Dedicated cursors whose row factory maps rows straight to objects
+        self.person_cursor = self.connection.cursor()
+        self.person_cursor.row_factory = Person.from_row
+        self.car_cursor = self.connection.cursor()
+        self.car_cursor.row_factory = Car.from_row
+        self.monitor = monitor if monitor is not None else QueryMonitor()
+        # Objects with observe(table, rows) and changed(table) methods,
+        # told about every insert and about updates/deletes
+        self.observers = []
+    
+    def execute(self, sql, params=(), fetch=None, cursor=None):
+        """Run a statement through the query monitor"""
+        return self.monitor.execute(cursor or self.cursor, sql, params, fetch)
+    
+    def executemany(self, sql, seq_of_params):
+        """Run a statement for many parameter sets through the query monitor"""
+        return self.monitor.executemany(self.cursor, sql, seq_of_params)
+    
+    def commit(self):
+        """Commit through the query monitor"""
+        self.monitor.commit(self.connection)
+    
+    def notify_inserted(self, table, rows):
+        """Pass committed rows (in Statements column order) to the observers"""
+        for observer in self.observers:
+            observer.observe(table, rows)
+    
+    def notify_changed(self, table):
+        """Tell the observers that committed rows were updated or deleted"""
+        for observer in self.observers:
+            observer.changed(table)
     
     def create_tables(self):
         """Create persons and cars tables"""
+        # Already set up (by this or an earlier process): skip the DDL.
+        # Looks for our own objects, the file may be shared with other schemas.
+        placeholders = ', '.join('?' * len(self.SCHEMA_OBJECTS))
+        existing = self.execute(f'SELECT COUNT(*) FROM sqlite_master WHERE name IN ({placeholders})',
+                                self.SCHEMA_OBJECTS, fetch='one')[0]
+        if existing == len(self.SCHEMA_OBJECTS):
+            return
+        
         # Create persons table
-        self.cursor.execute('''
+        self.execute('''
             CREATE TABLE IF NOT EXISTS persons (
                 person_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -111,7 +297,7 @@ class DatabaseManager:
         ''')
         
         # Create cars table
-        self.cursor.execute('''
+        self.execute('''
             CREATE TABLE IF NOT EXISTS cars (
                 car_id INTEGER PRIMARY KEY,
                 brand TEXT NOT NULL,
@@ -123,17 +309,119 @@ class DatabaseManager:
             )
         ''')
         
-        self.connection.commit()
+        # Owner lookups and deletes filter on owner_id
+        self.execute('CREATE INDEX IF NOT EXISTS idx_cars_owner ON cars(owner_id)')
+        
+        self.create_summary_tables()
+        self.commit()
         print("✅ Tables created successfully")
     
+    # Summary table -> (key column, query that computes it from cars)
+    SUMMARY_TABLES = {
+        'owner_car_counts': ('owner_id', 'SELECT owner_id, COUNT(*) FROM cars WHERE owner_id IS NOT NULL GROUP BY owner_id'),
+        'brand_counts': ('brand', 'SELECT brand, COUNT(*) FROM cars GROUP BY brand'),
+        'color_counts': ('color', 'SELECT color, COUNT(*) FROM cars GROUP BY color'),
+    }
+    
+    # Trigger bodies that add/remove one car to/from the summaries
+    _SUMMARY_ADD = '''
+        INSERT INTO brand_counts (brand, car_count) VALUES (NEW.brand, 1)
+            ON CONFLICT(brand) DO UPDATE SET car_count = car_count + 1;
+        INSERT INTO color_counts (color, car_count) VALUES (NEW.color, 1)
+            ON CONFLICT(color) DO UPDATE SET car_count = car_count + 1;
+        INSERT INTO owner_car_counts (owner_id, car_count)
+            SELECT NEW.owner_id, 1 WHERE NEW.owner_id IS NOT NULL
+            ON CONFLICT(owner_id) DO UPDATE SET car_count = car_count + 1;
+    '''
+    _SUMMARY_REMOVE = '''
+        UPDATE brand_counts SET car_count = car_count - 1 WHERE brand = OLD.brand;
+        DELETE FROM brand_counts WHERE brand = OLD.brand AND car_count <= 0;
+        UPDATE color_counts SET car_count = car_count - 1 WHERE color = OLD.color;
+        DELETE FROM color_counts WHERE color = OLD.color AND car_count <= 0;
+        UPDATE owner_car_counts SET car_count = car_count - 1 WHERE owner_id = OLD.owner_id;
+        DELETE FROM owner_car_counts WHERE owner_id = OLD.owner_id AND car_count <= 0;
+    '''
+    
+    def create_summary_tables(self):
+        """Create the materialised car summaries and the triggers that maintain them"""
+        for table, (key, _) in self.SUMMARY_TABLES.items():
+            key_type = 'INTEGER' if key == 'owner_id' else 'TEXT'
+            self.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key} {key_type} PRIMARY KEY,
+                    car_count INTEGER NOT NULL
+                )
+            ''')
+        
+        existing = self.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'cars_summary_%'",
+            fetch='one')[0]
+        
+        self.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cars_summary_insert AFTER INSERT ON cars
+            BEGIN {self._SUMMARY_ADD} END
+        ''')
+        self.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cars_summary_delete AFTER DELETE ON cars
+            BEGIN {self._SUMMARY_REMOVE} END
+        ''')
+        self.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS cars_summary_update AFTER UPDATE OF brand, color, owner_id ON cars
+            BEGIN {self._SUMMARY_REMOVE} {self._SUMMARY_ADD} END
+        ''')
+        
+        # Cars stored before the triggers existed are not counted yet
+        if existing < 3:
+            self.refresh_summaries(commit=False)
+    
+    def drop_summary_triggers(self):
+        """Stop maintaining the summaries row by row, for bulk loads.
+        
+        Call create_tables() afterwards: it recreates the triggers and
+        rebuilds the summaries in one pass.
+        """
+        for name in ('cars_summary_insert', 'cars_summary_delete', 'cars_summary_update'):
+            # If the load never finishes, the missing triggers make the next
+            # create_tables() repair the summaries
+            self.execute(f'DROP TRIGGER IF EXISTS {name}')
+    
+    def refresh_summaries(self, commit=True):
+        """Rebuild every summary table from the cars table (e.g. after a raw bulk load)"""
+        for table, (key, query) in self.SUMMARY_TABLES.items():
+            self.execute(f'DELETE FROM {table}')
+            self.execute(f'INSERT INTO {table} ({key}, car_count) {query}')
+        if commit:
+            self.commit()
+    
+    def check_summaries(self, repair=False):
+        """Recompute the summaries from scratch and compare them with the stored ones.
+        
+        Returns {table: [(key, stored_count, actual_count), ...]} for every mismatch.
+        """
+        mismatches = {}
+        for table, (key, query) in self.SUMMARY_TABLES.items():
+            stored = dict(self.execute(f'SELECT {key}, car_count FROM {table}', fetch='all'))
+            actual = dict(self.execute(query, fetch='all'))
+            diff = [(k, stored.get(k, 0), actual.get(k, 0))
+                    for k in stored.keys() | actual.keys()
+                    if stored.get(k, 0) != actual.get(k, 0)]
+            if diff:
+                mismatches[table] = diff
+        
+        if mismatches:
+            print(f"❌ Summary tables out of sync: {', '.join(mismatches)}")
+            if repair:
+                self.refresh_summaries()
+                print("✅ Summary tables rebuilt")
+        return mismatches
+    
     def insert_person(self, person):
         """Insert a person into database"""
         try:
-            self.cursor.execute('''
-                INSERT INTO persons (person_id, name, age, email)
-                VALUES (?, ?, ?, ?)
-            ''', (person.person_id, person.name, person.age, person.email))
-            self.connection.commit()
+            row = (person.person_id, person.name, person.age, person.email)
+            self.execute(Statements.INSERT_PERSON, row)
+            self.commit()
+            self.notify_inserted('persons', [row])
             print(f"✅ Person {person.name} added successfully")
             return True
         except sqlite3.IntegrityError as e:
@@ -143,68 +431,52 @@ class DatabaseManager:
     def insert_car(self, car):
         """Insert a car into database"""
         try:
-            self.cursor.execute('''
-                INSERT INTO cars (car_id, brand, model, year, color, owner_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (car.car_id, car.brand, car.model, car.year, car.color, car.owner_id))
-            self.connection.commit()
+            row = (car.car_id, car.brand, car.model, car.year, car.color, car.owner_id)
+            self.execute(Statements.INSERT_CAR, row)
+            self.commit()
+            self.notify_inserted('cars', [row])
             print(f"✅ Car {car.brand} {car.model} added successfully")
             return True
         except sqlite3.IntegrityError as e:
             print(f"❌ Error: {e}")
             return False
     
-    def get_all_persons(self):
-        """Get all persons from database"""
-        self.cursor.execute('SELECT * FROM persons')
-        rows = self.cursor.fetchall()
-        persons = []
-        for row in rows:
-            person = Person(row[0], row[1], row[2], row[3])
-            # Load cars for this person
-            person.cars = self.get_cars_by_owner(person.person_id)
-            persons.append(person)
+    def attach_lazy_cars(self, persons, prefetch=None):
+        """Give every person a cars list that is loaded on first access"""
+        loader = CarLoader(self, [p.person_id for p in persons], prefetch or self.PREFETCH_SIZE)
+        for person in persons:
+            person.cars = LazyCars(loader, person.person_id)
         return persons
     
+    def get_all_persons(self, prefetch=None):
+        """Get all persons from database (cars are loaded lazily, prefetch owners at a time)"""
+        persons = self.execute(Statements.SELECT_ALL_PERSONS, fetch='all', cursor=self.person_cursor)
+        return self.attach_lazy_cars(persons, prefetch)
+    
     def get_all_cars(self):
         """Get all cars from database"""
-        self.cursor.execute('SELECT * FROM cars')
-        rows = self.cursor.fetchall()
-        cars = []
-        for row in rows:
-            car = Car(row[0], row[1], row[2], row[3], row[4], row[5])
-            cars.append(car)
-        return cars
+        return self.execute(Statements.SELECT_ALL_CARS, fetch='all', cursor=self.car_cursor)
     
     def get_person_by_id(self, person_id):
         """Get person by ID"""
-        self.cursor.execute('SELECT * FROM persons WHERE person_id = ?', (person_id,))
-        row = self.cursor.fetchone()
-        if row:
-            person = Person(row[0], row[1], row[2], row[3])
-            person.cars = self.get_cars_by_owner(person.person_id)
+        person = self.execute(Statements.SELECT_PERSON_BY_ID, (person_id,),
+                              fetch='one', cursor=self.person_cursor)
+        if person:
+            self.attach_lazy_cars([person], prefetch=1)
             return person
         return None
     
     def get_cars_by_owner(self, owner_id):
         """Get all cars owned by a person"""
-        self.cursor.execute('SELECT * FROM cars WHERE owner_id = ?', (owner_id,))
-        rows = self.cursor.fetchall()
-        cars = []
-        for row in rows:
-            car = Car(row[0], row[1], row[2], row[3], row[4], row[5])
-            cars.append(car)
-        return cars
+        return self.execute(Statements.SELECT_CARS_BY_OWNER, (owner_id,),
+                            fetch='all', cursor=self.car_cursor)
     
     def update_person(self, person):
         """Update person details"""
         try:
-            self.cursor.execute('''
-                UPDATE persons 
-                SET name = ?, age = ?, email = ?
-                WHERE person_id = ?
-            ''', (person.name, person.age, person.email, person.person_id))
-            self.connection.commit()
+            self.execute(Statements.UPDATE_PERSON, (person.name, person.age, person.email, person.person_id))
+            self.commit()
+            self.notify_changed('persons')
             print(f"✅ Person {person.name} updated successfully")
             return True
         except sqlite3.IntegrityError as e:
@@ -214,72 +486,57 @@ class DatabaseManager:
     def delete_person(self, person_id):
         """Delete person from database"""
         # First delete all cars owned by this person
-        self.cursor.execute('DELETE FROM cars WHERE owner_id = ?', (person_id,))
+        self.execute(Statements.DELETE_CARS_BY_OWNER, (person_id,))
         # Then delete the person
-        self.cursor.execute('DELETE FROM persons WHERE person_id = ?', (person_id,))
-        self.connection.commit()
+        self.execute(Statements.DELETE_PERSON, (person_id,))
+        self.commit()
+        self.notify_changed('cars')
+        self.notify_changed('persons')
         print(f"✅ Person ID {person_id} deleted successfully")
     
     def find_persons_with_multiple_cars(self):
         """Find persons who own more than one car"""
-        self.cursor.execute('''
-            SELECT p.*, COUNT(c.car_id) as car_count
-            FROM persons p
-            JOIN cars c ON p.person_id = c.owner_id
-            GROUP BY p.person_id
-            HAVING car_count > 1
-        ''')
-        rows = self.cursor.fetchall()
+        rows = self.execute('''
+            SELECT p.*, s.car_count
+            FROM owner_car_counts s
+            JOIN persons p ON p.person_id = s.owner_id
+            WHERE s.car_count > 1
+        ''', fetch='all')
         return rows
     
     def find_cars_older_than(self, year):
         """Find cars older than specified year"""
-        self.cursor.execute('''
-            SELECT * FROM cars WHERE year < ?
-        ''', (year,))
-        rows = self.cursor.fetchall()
-        cars = []
-        for row in rows:
-            car = Car(row[0], row[1], row[2], row[3], row[4], row[5])
-            cars.append(car)
-        return cars
+        return self.execute(Statements.SELECT_CARS_OLDER_THAN, (year,),
+                            fetch='all', cursor=self.car_cursor)
     
     def get_average_cars_per_person(self):
         """Calculate average cars per person"""
-        self.cursor.execute('''
-            SELECT AVG(car_count) FROM (
-                SELECT COUNT(car_id) as car_count
-                FROM cars
-                GROUP BY owner_id
-            )
-        ''')
-        result = self.cursor.fetchone()
+        result = self.execute('SELECT AVG(car_count) FROM owner_car_counts', fetch='one')
         return result[0] if result[0] else 0
     
     def find_most_popular_brand(self):
         """Find the most popular car brand"""
-        self.cursor.execute('''
-            SELECT brand, COUNT(*) as count
-            FROM cars
-            GROUP BY brand
-            ORDER BY count DESC
+        result = self.execute('''
+            SELECT brand, car_count
+            FROM brand_counts
+            ORDER BY car_count DESC
             LIMIT 1
-        ''')
-        result = self.cursor.fetchone()
+        ''', fetch='one')
         return result if result else None
     
+    def get_brand_counts(self):
+        """Get the number of cars per brand"""
+        return dict(self.execute('SELECT brand, car_count FROM brand_counts', fetch='all'))
+    
+    def get_color_counts(self):
+        """Get the number of cars per color"""
+        return dict(self.execute('SELECT color, car_count FROM color_counts', fetch='all'))
+    
     def get_persons_by_age_range(self, min_age, max_age):
         """Find persons in age range"""
-        self.cursor.execute('''
-            SELECT * FROM persons 
-            WHERE age BETWEEN ? AND ?
-        ''', (min_age, max_age))
-        rows = self.cursor.fetchall()
-        persons = []
-        for row in rows:
-            person = Person(row[0], row[1], row[2], row[3])
-            persons.append(person)
-        return persons
+        persons = self.execute(Statements.SELECT_PERSONS_BY_AGE, (min_age, max_age),
+                               fetch='all', cursor=self.person_cursor)
+        return self.attach_lazy_cars(persons)
     
     def close(self):
         """Close database connection"""
@@ -287,6 +544,174 @@ class DatabaseManager:
         print("✅ Database connection closed")
 
 
+# ========================================
+# Profiling Support
+# ========================================
+
+class StackCollector:
+    """sys.setprofile hook that sums time per call stack (flamegraph "collapsed" format)"""
+    
+    def __init__(self):
+        self.stack = []
+        self.times = defaultdict(float)
+        self.last = time.perf_counter()
+    
+    @staticmethod
+    def frame_name(frame, event, arg):
+        if event == 'c_call':
+            return getattr(arg, '__qualname__', repr(arg))
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    
+    def __call__(self, frame, event, arg):
+        now = time.perf_counter()
+        if self.stack:
+            self.times[';'.join(self.stack)] += now - self.last
+        if event in ('call', 'c_call'):
+            self.stack.append(self.frame_name(frame, event, arg).replace(';', ','))
+        elif self.stack:
+            self.stack.pop()
+        self.last = now
+    
+    def write(self, filename):
+        """One "frame;frame;frame microseconds" line per stack"""
+        with open(filename, 'w', encoding='utf-8') as file:
+            for stack, seconds in self.times.items():
+                micros = int(seconds * 1_000_000)
+                if micros:
+                    file.write(f"{stack} {micros}\n")
+
+
+class ActionProfiler:
+    """Times menu/demo actions and splits each one into SQL, CSV I/O and Python time.
+    
+    Modes: 'timing' (spans only), 'cprofile' (also a .pstats file per action)
+    and 'flamegraph' (also a collapsed-stack file per action).
+    Enable with PERSONS_CARS_PROFILE=<mode> or the --profile[=mode] flag.
+    """
+    
+    MODES = ('timing', 'cprofile', 'flamegraph')
+    ENV_VAR = 'PERSONS_CARS_PROFILE'
+    
+    # The profiler of the action that is running right now, used by profiled_csv
+    current = None
+    
+    def __init__(self, monitor, mode='timing', output_dir='profiles'):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', expected one of {self.MODES}")
+        self.monitor = monitor
+        self.mode = mode
+        self.output_dir = output_dir
+        self.csv_time = 0.0
+        self.input_time = 0.0
+        self.count = 0
+        self.summary = {}
+    
+    @classmethod
+    def from_settings(cls, monitor, argv=None):
+        """Build a profiler from --profile[=mode] or the environment, or return None"""
+        mode = os.environ.get(cls.ENV_VAR)
+        for arg in sys.argv[1:] if argv is None else argv:
+            if arg == '--profile':
+                mode = 'timing'
+            elif arg.startswith('--profile='):
+                mode = arg.split('=', 1)[1]
+        if not mode or mode == '0':
+            return None
+        return cls(monitor, 'timing' if mode == '1' else mode)
+    
+    def sql_time(self):
+        return sum(stat['total_time'] for stat in self.monitor.stats.values())
+    
+    def timed_input(self, prompt=''):
+        """input() replacement so waiting for the user is not counted as work"""
+        start = time.perf_counter()
+        try:
+            return self.original_input(prompt)
+        finally:
+            self.input_time += time.perf_counter() - start
+    
+    @contextmanager
+    def action(self, name):
+        """Profile one action"""
+        self.count += 1
+        sql_before, csv_before, input_before = self.sql_time(), self.csv_time, self.input_time
+        self.original_input = builtins.input
+        builtins.input = self.timed_input
+        ActionProfiler.current = self
+        
+        profile = collector = None
+        if self.mode == 'cprofile':
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        elif self.mode == 'flamegraph':
+            collector = StackCollector()
+            sys.setprofile(collector)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile:
+                profile.disable()
+            if collector:
+                sys.setprofile(None)
+            builtins.input = self.original_input
+            ActionProfiler.current = None
+            
+            waited = self.input_time - input_before
+            self.record(name, elapsed - waited, self.sql_time() - sql_before,
+                        self.csv_time - csv_before)
+            if profile or collector:
+                os.makedirs(self.output_dir, exist_ok=True)
+                base = os.path.join(self.output_dir, f"{self.count:03d}_{name}")
+                if profile:
+                    profile.dump_stats(f"{base}.pstats")
+                else:
+                    collector.write(f"{base}.collapsed")
+    
+    def record(self, name, total, sql, csv_io):
+        entry = self.summary.setdefault(name, {'calls': 0, 'total': 0.0, 'sql': 0.0, 'csv': 0.0})
+        entry['calls'] += 1
+        entry['total'] += total
+        entry['sql'] += sql
+        entry['csv'] += csv_io
+        print(f"⏱️  {name}: {total * 1000:.1f}ms (SQL {sql * 1000:.1f}ms, "
+              f"CSV {csv_io * 1000:.1f}ms, Python {(total - sql - csv_io) * 1000:.1f}ms)")
+    
+    def print_summary(self):
+        """Per-action time split; SQL includes mapping rows to objects during fetch"""
+        print("\n" + "="*60)
+        print("⏱️  PROFILE SUMMARY")
+        print("="*60)
+        print(f"{'action':<32}{'calls':>6}{'total ms':>10}{'SQL %':>7}{'CSV %':>7}{'Py %':>7}")
+        for name, entry in sorted(self.summary.items(), key=lambda x: x[1]['total'], reverse=True):
+            total = entry['total'] or 1e-9
+            python = entry['total'] - entry['sql'] - entry['csv']
+            print(f"{name:<32}{entry['calls']:>6}{entry['total'] * 1000:>10.1f}"
+                  f"{entry['sql'] / total:>7.0%}{entry['csv'] / total:>7.0%}{python / total:>7.0%}")
+        if self.mode != 'timing':
+            print(f"\nProfile files written to {os.path.abspath(self.output_dir)}")
+        print("="*60 + "\n")
+
+
+def profiled_csv(func):
+    """Count a CSVManager call as CSV I/O time of the running action (minus its SQL)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiler = ActionProfiler.current
+        if profiler is None:
+            return func(*args, **kwargs)
+        start, sql_before = time.perf_counter(), profiler.sql_time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sql = profiler.sql_time() - sql_before
+            profiler.csv_time += time.perf_counter() - start - sql
+    return wrapper
+
+
 # ========================================
 # Part 3: CSV Manager
 # ========================================
@@ -295,6 +720,7 @@ class CSVManager:
     """Manages CSV import/export operations"""
     
     @staticmethod
+    @profiled_csv
     def export_persons_to_csv(persons, filename='persons.csv'):
         """Export persons list to CSV file"""
         try:
@@ -317,6 +743,7 @@ class CSVManager:
             return False
     
     @staticmethod
+    @profiled_csv
     def export_cars_to_csv(cars, filename='cars.csv'):
         """Export cars list to CSV file"""
         try:
@@ -341,6 +768,7 @@ class CSVManager:
             return False
     
     @staticmethod
+    @profiled_csv
     def import_persons_from_csv(filename='persons.csv'):
         """Import persons from CSV file"""
         persons = []
@@ -362,6 +790,7 @@ class CSVManager:
             return []
     
     @staticmethod
+    @profiled_csv
     def import_cars_from_csv(filename='cars.csv'):
         """Import cars from CSV file"""
         cars = []
@@ -386,6 +815,7 @@ class CSVManager:
             return []
     
     @staticmethod
+    @profiled_csv
     def export_full_report(db_manager, filename='full_report.csv'):
         """Export full report with persons and their cars"""
         try:
@@ -436,19 +866,11 @@ class StatisticsManager:
     
     def get_brand_distribution(self):
         """Get distribution of car brands"""
-        cars = self.db_manager.get_all_cars()
-        brands = {}
-        for car in cars:
-            brands[car.brand] = brands.get(car.brand, 0) + 1
-        return brands
+        return self.db_manager.get_brand_counts()
     
     def get_color_distribution(self):
         """Get distribution of car colors"""
-        cars = self.db_manager.get_all_cars()
-        colors = {}
-        for car in cars:
-            colors[car.color] = colors.get(car.color, 0) + 1
-        return colors
+        return self.db_manager.get_color_counts()
     
     def print_statistics(self):
         """Print comprehensive statistics"""
@@ -497,10 +919,16 @@ class StatisticsManager:
 class PersonCarManagementSystem:
     """Main system with interactive menu"""
     
-    def __init__(self):
+    def __init__(self, profiler=None):
         self.db_manager = DatabaseManager()
         self.db_manager.create_tables()
         self.stats_manager = StatisticsManager(self.db_manager)
+        self.approx_stats = None
+        self.profiler = profiler or ActionProfiler.from_settings(self.db_manager.monitor)
+    
+    def profile(self, name):
+        """Profiling span for one action (no-op unless profiling is on)"""
+        return self.profiler.action(name) if self.profiler else nullcontext()
     
     def display_menu(self):
         """Display main menu"""
@@ -519,6 +947,7 @@ class PersonCarManagementSystem:
         print("10. ייבא מCSV")
         print("11. סטטיסטיקות")
         print("12. מצא אנשים עם מספר מכוניות")
+        print("13. סטטיסטיקות מהירות (משוערות)")
         print("0.  יציאה")
         print("="*60)
     
@@ -674,6 +1103,13 @@ class PersonCarManagementSystem:
         """Show statistics"""
         self.stats_manager.print_statistics()
     
+    def show_approximate_statistics(self):
+        """Show sketch-based statistics (milliseconds on large tables)"""
+        if self.approx_stats is None:
+            from sketches import ApproximateStatistics
+            self.approx_stats = ApproximateStatistics(self.db_manager).load_or_rebuild()
+        self.approx_stats.print_statistics()
+    
     def find_persons_with_multiple_cars(self):
         """Find persons with multiple cars"""
         print("\n--- אנשים עם מספר מכוניות ---")
@@ -688,53 +1124,58 @@ class PersonCarManagementSystem:
         """Main loop"""
         print("🎉 ברוכים הבאים למערכת ניהול אנשים ומכוניות!")
         
+        actions = {
+            '1': self.add_person,
+            '2': self.add_car,
+            '3': self.show_all_persons,
+            '4': self.show_all_cars,
+            '5': self.search_person,
+            '6': self.show_person_cars,
+            '7': self.update_person,
+            '8': self.delete_person,
+            '9': self.export_to_csv,
+            '10': self.import_from_csv,
+            '11': self.show_statistics,
+            '12': self.find_persons_with_multiple_cars,
+            '13': self.show_approximate_statistics,
+        }
+        
         while True:
             self.display_menu()
             choice = input("\nבחר אפשרות: ").strip()
             
-            if choice == '1':
-                self.add_person()
-            elif choice == '2':
-                self.add_car()
-            elif choice == '3':
-                self.show_all_persons()
-            elif choice == '4':
-                self.show_all_cars()
-            elif choice == '5':
-                self.search_person()
-            elif choice == '6':
-                self.show_person_cars()
-            elif choice == '7':
-                self.update_person()
-            elif choice == '8':
-                self.delete_person()
-            elif choice == '9':
-                self.export_to_csv()
-            elif choice == '10':
-                self.import_from_csv()
-            elif choice == '11':
-                self.show_statistics()
-            elif choice == '12':
-                self.find_persons_with_multiple_cars()
-            elif choice == '0':
+            if choice == '0':
                 print("\n👋 להתראות!")
+                if self.profiler:
+                    self.profiler.print_summary()
+                if self.approx_stats:
+                    self.approx_stats.save()
                 self.db_manager.close()
                 break
-            else:
+            
+            action = actions.get(choice)
+            if action is None:
                 print("❌ אפשרות לא קיימת")
+                continue
+            with self.profile(action.__name__):
+                action()
 
 
 # ========================================
 # Demo Function
 # ========================================
 
-def demo():
+def demo(profiler=None):
     """Demo function with sample data"""
     print("\n🎬 Running Demo with Sample Data...\n")
     
     # Create database manager
     db = DatabaseManager('demo_persons_cars.db')
     db.create_tables()
+    profiler = profiler or ActionProfiler.from_settings(db.monitor)
+    
+    def step(name):
+        return profiler.action(name) if profiler else nullcontext()
     
     # Create persons
     persons = [
@@ -754,30 +1195,39 @@ def demo():
     
     # Insert to database
     print("📝 Inserting data...")
-    for person in persons:
-        db.insert_person(person)
-    
-    for car in cars:
-        db.insert_car(car)
+    with step('insert'):
+        for person in persons:
+            db.insert_person(person)
+        
+        for car in cars:
+            db.insert_car(car)
     
     # Display all
     print("\n" + "="*60)
-    all_persons = db.get_all_persons()
-    print("👥 All Persons:")
-    for person in all_persons:
-        print(f"\n{person}")
-        for car in person.cars:
-            print(f"   └─ {car}")
+    with step('show_all_persons'):
+        all_persons = db.get_all_persons()
+        print("👥 All Persons:")
+        for person in all_persons:
+            print(f"\n{person}")
+            for car in person.cars:
+                print(f"   └─ {car}")
     
     # Statistics
-    stats = StatisticsManager(db)
-    stats.print_statistics()
+    with step('statistics'):
+        stats = StatisticsManager(db)
+        stats.print_statistics()
     
     # Export to CSV
     print("\n📤 Exporting to CSV...")
-    CSVManager.export_persons_to_csv(all_persons, 'demo_persons.csv')
-    CSVManager.export_cars_to_csv(db.get_all_cars(), 'demo_cars.csv')
-    CSVManager.export_full_report(db, 'demo_full_report.csv')
+    with step('export'):
+        CSVManager.export_persons_to_csv(all_persons, 'demo_persons.csv')
+        CSVManager.export_cars_to_csv(db.get_all_cars(), 'demo_cars.csv')
+        CSVManager.export_full_report(db, 'demo_full_report.csv')
+    
+    # Query timings
+    db.monitor.print_report()
+    if profiler:
+        profiler.print_summary()
     
     # Close database
     db.close()
@@ -792,10 +1242,14 @@ if __name__ == "__main__":
     print("Choose an option:")
     print("1. Run Demo")
     print("2. Run Management System")
-    choice = input("Enter choice (1/2): ").strip()
+    print("3. Run Batch File")
+    choice = input("Enter choice (1/2/3): ").strip()
     
     if choice == '1':
         demo()
+    elif choice == '3':
+        from batch_mode import BatchProcessor
+        BatchProcessor().run(input("Commands file: ").strip())
     else:
         system = PersonCarManagementSystem()
         system.run()
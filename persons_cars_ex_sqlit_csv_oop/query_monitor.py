@@ -0,0 +1,189 @@
+"""
+Query Monitor - Persons and Cars Management System
+Per-statement latency histograms, row and call counts, a slow-query log
+and Prometheus text export for any sqlite3 cursor.
+
+Kept in its own module so small scripts (example_csv_sqlite.py) can use
+it without importing the whole management system.
+
+Usage:
+    python query_monitor.py   # self-check of the slow-query log
+"""
+
+import sqlite3
+import time
+from bisect import bisect_left
+from datetime import datetime
+from itertools import accumulate
+
+
+class QueryMonitor:
+    """Collects per-statement latency, row and call counts plus a slow-query log"""
+    
+    LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+    
+    def __init__(self, slow_query_threshold=0.1, explain_slow_queries=False, slow_log_file=None):
+        self.slow_query_threshold = slow_query_threshold
+        self.explain_slow_queries = explain_slow_queries
+        self.slow_log_file = slow_log_file
+        self.stats = {}
+        self.slow_queries = []
+        self._keys = {}
+    
+    @staticmethod
+    def normalize(sql):
+        """Collapse whitespace so the same statement always gets the same key"""
+        return ' '.join(sql.split())
+    
+    def execute(self, cursor, sql, params=(), fetch=None):
+        """Execute a statement, time it (including the fetch) and record it"""
+        start = time.perf_counter()
+        cursor.execute(sql, params)
+        if fetch == 'all':
+            result = cursor.fetchall()
+            rows = len(result)
+        elif fetch == 'one':
+            result = cursor.fetchone()
+            rows = 0 if result is None else 1
+        else:
+            result = cursor
+            rows = max(cursor.rowcount, 0)
+        elapsed = time.perf_counter() - start
+        self.record(cursor, sql, params, elapsed, rows)
+        return result
+    
+    def executemany(self, cursor, sql, seq_of_params):
+        """Execute a statement for many parameter sets and record it once"""
+        start = time.perf_counter()
+        cursor.executemany(sql, seq_of_params)
+        elapsed = time.perf_counter() - start
+        self.record(cursor, sql, (), elapsed, max(cursor.rowcount, 0))
+        return cursor
+    
+    def commit(self, connection):
+        """Commit and record the time spent under the "COMMIT" key"""
+        start = time.perf_counter()
+        connection.commit()
+        self.record(None, 'COMMIT', (), time.perf_counter() - start, 0)
+    
+    def record(self, cursor, sql, params, elapsed, rows):
+        """Update the statistics of one statement"""
+        key = self._keys.get(sql)
+        if key is None:
+            key = self._keys[sql] = self.normalize(sql)
+        stat = self.stats.get(key)
+        if stat is None:
+            stat = {
+                'calls': 0,
+                'rows': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+                # One slot per bucket plus a final "+Inf" slot
+                'buckets': [0] * (len(self.LATENCY_BUCKETS) + 1)
+            }
+            self.stats[key] = stat
+        stat['calls'] += 1
+        stat['rows'] += rows
+        stat['total_time'] += elapsed
+        if elapsed > stat['max_time']:
+            stat['max_time'] = elapsed
+        stat['buckets'][bisect_left(self.LATENCY_BUCKETS, elapsed)] += 1
+        
+        if elapsed >= self.slow_query_threshold:
+            self.log_slow_query(cursor, key, params, elapsed, rows)
+    
+    def log_slow_query(self, cursor, sql, params, elapsed, rows):
+        """Remember a slow statement and optionally capture its query plan"""
+        entry = {
+            'sql': sql,
+            'params': params,
+            'duration': elapsed,
+            'rows': rows,
+            'plan': None
+        }
+        if self.explain_slow_queries and cursor is not None:
+            try:
+                # A separate cursor keeps the caller's cursor state intact
+                plan_cursor = cursor.connection.cursor()
+                plan_cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                entry['plan'] = [row[-1] for row in plan_cursor.fetchall()]
+                plan_cursor.close()
+            except sqlite3.Error:
+                pass
+        self.slow_queries.append(entry)
+        
+        if self.slow_log_file:
+            with open(self.slow_log_file, 'a', encoding='utf-8') as file:
+                file.write(f"{datetime.now().isoformat()} {elapsed * 1000:.2f}ms rows={rows} {sql}\n")
+                for line in entry['plan'] or []:
+                    file.write(f"    PLAN: {line}\n")
+    
+    def reset(self):
+        """Clear all collected statistics"""
+        self.stats.clear()
+        self.slow_queries.clear()
+    
+    def to_prometheus(self):
+        """Export the collected metrics in Prometheus text format"""
+        def label(sql):
+            escaped = sql.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            return f'statement="{escaped}"'
+        
+        lines = [
+            '# HELP sql_query_duration_seconds Statement latency including fetch',
+            '# TYPE sql_query_duration_seconds histogram'
+        ]
+        for sql, stat in self.stats.items():
+            # Prometheus buckets are cumulative
+            for bound, count in zip(self.LATENCY_BUCKETS, accumulate(stat['buckets'])):
+                lines.append(f'sql_query_duration_seconds_bucket{{{label(sql)},le="{bound}"}} {count}')
+            lines.append(f'sql_query_duration_seconds_bucket{{{label(sql)},le="+Inf"}} {stat["calls"]}')
+            lines.append(f'sql_query_duration_seconds_sum{{{label(sql)}}} {stat["total_time"]}')
+            lines.append(f'sql_query_duration_seconds_count{{{label(sql)}}} {stat["calls"]}')
+        
+        lines.append('# HELP sql_query_rows_total Rows returned or changed by the statement')
+        lines.append('# TYPE sql_query_rows_total counter')
+        for sql, stat in self.stats.items():
+            lines.append(f'sql_query_rows_total{{{label(sql)}}} {stat["rows"]}')
+        
+        lines.append('# HELP sql_slow_queries_total Statements slower than the threshold')
+        lines.append('# TYPE sql_slow_queries_total counter')
+        lines.append(f'sql_slow_queries_total {len(self.slow_queries)}')
+        return '\n'.join(lines) + '\n'
+    
+    def print_report(self):
+        """Print the statements ordered by total time"""
+        print("\n" + "="*60)
+        print("⏱️  QUERY REPORT")
+        print("="*60)
+        ordered = sorted(self.stats.items(), key=lambda x: x[1]['total_time'], reverse=True)
+        for sql, stat in ordered:
+            avg_ms = stat['total_time'] / stat['calls'] * 1000
+            print(f"{stat['calls']:>6} calls  {stat['total_time'] * 1000:>9.2f}ms total  "
+                  f"{avg_ms:>7.3f}ms avg  {stat['rows']:>7} rows  {sql[:60]}")
+        if self.slow_queries:
+            print(f"\n🐢 Slow queries (>= {self.slow_query_threshold * 1000:.0f}ms): {len(self.slow_queries)}")
+        print("="*60 + "\n")
+
+
+def self_check():
+    """Slow statements whose plan cannot be explained are still logged"""
+    connection = sqlite3.connect(':memory:')
+    cursor = connection.cursor()
+    monitor = QueryMonitor(slow_query_threshold=0, explain_slow_queries=True)
+    monitor.execute(cursor, 'CREATE TABLE t (x INTEGER)')
+    # executemany logs with params=() and PRAGMAs have no query plan
+    monitor.executemany(cursor, 'INSERT INTO t VALUES (?)', [(1,), (2,)])
+    monitor.execute(cursor, 'PRAGMA user_version', fetch='one')
+    monitor.execute(cursor, 'SELECT x FROM t WHERE x = ?', (1,), fetch='all')
+    connection.close()
+    
+    plans = {entry['sql']: entry['plan'] for entry in monitor.slow_queries}
+    assert plans['INSERT INTO t VALUES (?)'] is None
+    assert plans['SELECT x FROM t WHERE x = ?'], plans
+    assert len(monitor.slow_queries) == 4
+    print("✅ QueryMonitor self-check passed")
+
+
+if __name__ == "__main__":
+    self_check()
@@ -0,0 +1,253 @@
+"""
+Sharded Storage - Persons and Cars Management System
+Spreads persons and their cars over several SQLite files.
+
+A person and all of the cars they own live in the same shard, chosen by
+hashing person_id; cars without an owner are placed by car_id. Point
+operations go to one shard, cross-shard queries run on every shard in a
+thread pool and the results are merged.
+
+car_id and email are kept unique over all shards: insert_car,
+insert_person, update_person and import_parallel check the other shards
+first (serialised by one lock, so this holds for writers in this process
+only).
+
+Usage:
+    python sharding.py            # import benchmark for 1, 2 and 4 shards
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from persons_cars_complete_solution import Car, DatabaseManager, Person, Statements
+
+
+def import_shard(db_name, person_rows, car_rows):
+    """Write one shard's rows in a single transaction (runs in a worker process)"""
+    db = DatabaseManager(db_name)
+    db.create_tables()
+    db.drop_summary_triggers()
+    db.executemany(Statements.INSERT_PERSON, person_rows)
+    db.executemany(Statements.INSERT_CAR, car_rows)
+    db.connection.commit()
+    # Recreates the triggers and rebuilds the summaries in one pass
+    db.create_tables()
+    db.connection.commit()
+    db.connection.close()
+    return len(person_rows) + len(car_rows)
+
+
+class ShardedDatabaseManager:
+    """DatabaseManager look-alike that routes to K shard files by person_id"""
+
+    # Methods returning persons whose LazyCars would query a shard later
+    PERSON_METHODS = ('get_all_persons', 'get_person_by_id', 'get_persons_by_age_range')
+
+    def __init__(self, db_name='persons_cars.db', shards=4):
+        base, ext = os.path.splitext(db_name)
+        self.shard_names = [f'{base}_shard{i}{ext}' for i in range(shards)]
+        # Every shard is only used by one thread at a time, guarded by its lock
+        self.shards = [DatabaseManager(name, check_same_thread=False) for name in self.shard_names]
+        self.locks = [threading.Lock() for _ in self.shards]
+        # Serialises the cross-shard car_id/email checks with the write that follows them
+        self.unique_lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=shards)
+
+    # ---------- routing ----------
+
+    def shard_index(self, person_id):
+        """Shard of a person (ints hash to themselves, so this is stable across runs)"""
+        return hash(person_id) % len(self.shards)
+
+    def car_shard_index(self, car):
+        """Cars live next to their owner"""
+        key = car.owner_id if car.owner_id is not None else car.car_id
+        return self.shard_index(key)
+
+    def call(self, index, method, *args):
+        """Call a DatabaseManager method on one shard"""
+        with self.locks[index]:
+            result = getattr(self.shards[index], method)(*args)
+            if method in self.PERSON_METHODS:
+                # Load the cars while the shard is still locked
+                for person in [result] if isinstance(result, Person) else result or []:
+                    person.cars = list(person.cars)
+            return result
+
+    def scatter(self, method, *args):
+        """Call a DatabaseManager method on every shard in parallel"""
+        futures = [self.pool.submit(self.call, i, method, *args) for i in range(len(self.shards))]
+        return [future.result() for future in futures]
+
+    def gather_lists(self, method, *args, key=None):
+        """Scatter and concatenate list results, optionally sorted"""
+        merged = [item for result in self.scatter(method, *args) for item in result]
+        if key:
+            merged.sort(key=key)
+        return merged
+
+    # ---------- writes ----------
+
+    def create_tables(self):
+        self.scatter('create_tables')
+
+    def existing_values(self, table, column, values, chunk_size=500):
+        """The given values of a UNIQUE column that are already stored in any shard"""
+        values = list(values)
+        found = set()
+        for i in range(0, len(values), chunk_size):
+            chunk = tuple(values[i:i + chunk_size])
+            sql = f'SELECT {column} FROM {table} WHERE {column} IN ({", ".join("?" * len(chunk))})'
+            for rows in self.scatter('execute', sql, chunk, 'all'):
+                found.update(row[0] for row in rows)
+        return found
+
+    def email_taken(self, email, person_id=None):
+        """True if a person other than person_id uses the email in any shard"""
+        results = self.scatter('execute', 'SELECT person_id FROM persons WHERE email = ?', (email,), 'all')
+        return any(row[0] != person_id for rows in results for row in rows)
+
+    def insert_person(self, person):
+        # Persons are routed by person_id, so a shard's UNIQUE alone cannot keep email unique
+        with self.unique_lock:
+            if self.email_taken(person.email):
+                print("❌ Error: UNIQUE constraint failed: persons.email")
+                return False
+            return self.call(self.shard_index(person.person_id), 'insert_person', person)
+
+    def insert_car(self, car):
+        # Cars follow their owner, so a shard's PRIMARY KEY alone cannot keep car_id unique
+        with self.unique_lock:
+            if self.existing_values('cars', 'car_id', [car.car_id]):
+                print("❌ Error: UNIQUE constraint failed: cars.car_id")
+                return False
+            return self.call(self.car_shard_index(car), 'insert_car', car)
+
+    def update_person(self, person):
+        with self.unique_lock:
+            if self.email_taken(person.email, person.person_id):
+                print("❌ Error: UNIQUE constraint failed: persons.email")
+                return False
+            return self.call(self.shard_index(person.person_id), 'update_person', person)
+
+    def delete_person(self, person_id):
+        return self.call(self.shard_index(person_id), 'delete_person', person_id)
+
+    def import_parallel(self, persons, cars):
+        """Bulk import with one writer process per shard"""
+        # multiprocessing is only worth importing when a bulk import happens
+        from concurrent.futures import ProcessPoolExecutor
+
+        car_ids = [c.car_id for c in cars]
+        if len(set(car_ids)) != len(car_ids):
+            raise ValueError("duplicate car_id in the imported cars")
+        emails = [p.email for p in persons]
+        if len(set(emails)) != len(emails):
+            raise ValueError("duplicate email in the imported persons")
+
+        person_rows = [[] for _ in self.shards]
+        car_rows = [[] for _ in self.shards]
+        for p in persons:
+            person_rows[self.shard_index(p.person_id)].append((p.person_id, p.name, p.age, p.email))
+        for c in cars:
+            car_rows[self.car_shard_index(c)].append((c.car_id, c.brand, c.model, c.year, c.color, c.owner_id))
+
+        self.create_tables()
+        with self.unique_lock, ProcessPoolExecutor(max_workers=len(self.shards)) as workers:
+            # Fresh shards cannot clash: skip the lookups
+            stored = self.scatter('execute', 'SELECT EXISTS (SELECT 1 FROM persons), '
+                                  'EXISTS (SELECT 1 FROM cars)', (), 'one')
+            if any(row[0] for row in stored):
+                existing = self.existing_values('persons', 'email', emails)
+                if existing:
+                    raise ValueError(f"{len(existing)} email(s) already exist, e.g. {min(existing)}")
+            if any(row[1] for row in stored):
+                existing = self.existing_values('cars', 'car_id', car_ids)
+                if existing:
+                    raise ValueError(f"{len(existing)} car_id(s) already exist, e.g. {min(existing)}")
+            futures = [workers.submit(import_shard, name, person_rows[i], car_rows[i])
+                       for i, name in enumerate(self.shard_names)]
+            total = sum(future.result() for future in futures)
+        print(f"✅ {total} rows imported into {len(self.shards)} shards")
+        return total
+
+    # ---------- point reads ----------
+
+    def get_person_by_id(self, person_id):
+        return self.call(self.shard_index(person_id), 'get_person_by_id', person_id)
+
+    def get_cars_by_owner(self, owner_id):
+        return self.call(self.shard_index(owner_id), 'get_cars_by_owner', owner_id)
+
+    # ---------- scatter-gather reads ----------
+
+    def get_all_persons(self):
+        return self.gather_lists('get_all_persons', key=lambda p: p.person_id)
+
+    def get_all_cars(self):
+        return self.gather_lists('get_all_cars', key=lambda c: c.car_id)
+
+    def get_persons_by_age_range(self, min_age, max_age):
+        return self.gather_lists('get_persons_by_age_range', min_age, max_age, key=lambda p: p.person_id)
+
+    def find_cars_older_than(self, year):
+        return self.gather_lists('find_cars_older_than', year, key=lambda c: c.car_id)
+
+    def find_persons_with_multiple_cars(self):
+        return self.gather_lists('find_persons_with_multiple_cars', key=lambda row: row[0])
+
+    def get_brand_counts(self):
+        return dict(sum((Counter(counts) for counts in self.scatter('get_brand_counts')), Counter()))
+
+    def get_color_counts(self):
+        return dict(sum((Counter(counts) for counts in self.scatter('get_color_counts')), Counter()))
+
+    def find_most_popular_brand(self):
+        counts = self.get_brand_counts()
+        if not counts:
+            return None
+        return max(counts.items(), key=lambda item: item[1])
+
+    def get_average_cars_per_person(self):
+        # Owners never span shards, so sums and counts can simply be added up
+        results = self.scatter('execute', 'SELECT SUM(car_count), COUNT(*) FROM owner_car_counts', (), 'one')
+        cars = sum(row[0] or 0 for row in results)
+        owners = sum(row[1] for row in results)
+        return cars / owners if owners else 0
+
+    def close(self):
+        self.pool.shutdown()
+        for shard in self.shards:
+            shard.close()
+
+
+# ========================================
+# Import Benchmark
+# ========================================
+
+def benchmark(persons_count=200000, cars_per_person=2, shard_counts=(1, 2, 4)):
+    """Compare bulk import time for different shard counts"""
+    persons = [Person(i, f"Person {i}", 20 + i % 50, f"p{i}@example.com") for i in range(1, persons_count + 1)]
+    cars = [Car(i, "Toyota", "Corolla", 2000 + i % 24, "White", 1 + i % persons_count)
+            for i in range(1, persons_count * cars_per_person + 1)]
+
+    for shards in shard_counts:
+        for i in range(shards):
+            if os.path.exists(f'bench_sharded_shard{i}.db'):
+                os.remove(f'bench_sharded_shard{i}.db')
+        db = ShardedDatabaseManager('bench_sharded.db', shards)
+        start = time.perf_counter()
+        total = db.import_parallel(persons, cars)
+        elapsed = time.perf_counter() - start
+        print(f"   {shards} shard(s): {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)")
+        db.close()
+        for name in db.shard_names:
+            os.remove(name)
+
+
+if __name__ == "__main__":
+    print(f"🧪 Import benchmark on {os.cpu_count()} CPU(s)")
+    benchmark()
@@ -0,0 +1,561 @@
+"""
+Approximate Statistics - Persons and Cars Management System
+Streaming sketches that answer the statistics report in milliseconds.
+
+- HyperLogLog: distinct brands, models and car owners
+- Count-Min sketch + Space-Saving: brand and color frequencies / top-K
+- t-digest: age and year quantiles
+
+The sketches are fed on every insert (DatabaseManager observers, batch
+mode) and saved in the sketch_state table. Triggers on the columns the
+sketches use write the old (and new) values of updated and deleted rows
+to sketch_log, from any connection. Those are applied incrementally:
+the exact counters, Count-Min and Space-Saving take the old rows out
+again. HyperLogLog and t-digest cannot, so the report widens their error
+bounds by the rows they still hold, and load_or_rebuild() rebuilds them
+once that is more than REBUILD_FRACTION of a table. The report itself
+only rebuilds (blocking) when the sketches were never built or another
+process pruned log rows they had not applied yet.
+
+Inserts made by other processes are only noticed by load_or_rebuild(),
+which compares the row counts. The log is pruned whenever the sketches
+are saved.
+"""
+
+import hashlib
+import json
+import math
+import time
+from collections import Counter
+
+
+def hash64(value):
+    """Stable 64-bit hash (Python's hash() is randomised per process)"""
+    return int.from_bytes(hashlib.blake2b(str(value).encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+# ========================================
+# Sketches
+# ========================================
+
+class HyperLogLog:
+    """Distinct-count estimate with a standard error of 1.04 / sqrt(2 ** precision)"""
+
+    def __init__(self, precision=12):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        h = hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return estimate
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_state(self):
+        return {'precision': self.precision, 'registers': self.registers.hex()}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['precision'])
+        sketch.registers = bytearray.fromhex(state['registers'])
+        return sketch
+
+
+class CountMinSketch:
+    """Frequency estimate that never undercounts and overcounts by at most
+    epsilon * total with probability 1 - delta"""
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = [[0] * self.width for _ in range(self.depth)]
+        self.total = 0
+
+    def indexes(self, value):
+        h = hash64(value)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, value, count=1):
+        for row, index in zip(self.table, self.indexes(value)):
+            row[index] += count
+        self.total += count
+
+    def estimate(self, value):
+        return min(row[index] for row, index in zip(self.table, self.indexes(value)))
+
+    @property
+    def error_bound(self):
+        return self.epsilon * self.total
+
+    def to_state(self):
+        return {'epsilon': self.epsilon, 'delta': self.delta, 'table': self.table, 'total': self.total}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['epsilon'], state['delta'])
+        sketch.table = state['table']
+        sketch.total = state['total']
+        return sketch
+
+
+class SpaceSaving:
+    """Top-K heavy hitters with at most k counters"""
+
+    def __init__(self, k=50):
+        self.k = k
+        self.counters = {}
+
+    def add(self, value, count=1):
+        if value in self.counters or len(self.counters) < self.k:
+            self.counters[value] = self.counters.get(value, 0) + count
+            return
+        # Replace the smallest counter; the newcomer inherits its count
+        smallest = min(self.counters, key=self.counters.get)
+        self.counters[value] = self.counters.pop(smallest) + count
+
+    def remove(self, value, count=1):
+        """Take back occurrences of a tracked value"""
+        if value in self.counters:
+            self.counters[value] = max(self.counters[value] - count, 0)
+
+    def top(self, n):
+        return sorted(self.counters, key=self.counters.get, reverse=True)[:n]
+
+    def to_state(self):
+        return {'k': self.k, 'counters': list(self.counters.items())}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['k'])
+        sketch.counters = dict((value, count) for value, count in state['counters'])
+        return sketch
+
+
+class TDigest:
+    """Merging t-digest for quantiles; a centroid near quantile q holds at most
+    4 * N * q * (1 - q) / compression points"""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []
+        self.buffer = []
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, weight=1):
+        self.buffer.append((value, weight))
+        self.total += weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.buffer) > 5 * self.compression:
+            self.compress()
+
+    def compress(self):
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        merged = []
+        mean, weight = points[0]
+        so_far = 0
+        for next_mean, next_weight in points[1:]:
+            q = (so_far + weight + next_weight / 2) / self.total
+            limit = 4 * self.total * q * (1 - q) / self.compression
+            if weight + next_weight <= max(limit, 1):
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                merged.append((mean, weight))
+                so_far += weight
+                mean, weight = next_mean, next_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q):
+        self.compress()
+        if not self.centroids:
+            return None
+        target = q * self.total
+        cumulative = 0
+        previous = None
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if center >= target:
+                if previous is None:
+                    return self.min + (mean - self.min) * (target / center if center else 0)
+                prev_center, prev_mean = previous
+                return prev_mean + (mean - prev_mean) * (target - prev_center) / (center - prev_center)
+            previous = (center, mean)
+            cumulative += weight
+        return self.max
+
+    def rank_error(self, q):
+        """Half the largest centroid allowed at q, as a fraction of N"""
+        return 2 * q * (1 - q) / self.compression
+
+    def to_state(self):
+        self.compress()
+        return {'compression': self.compression, 'centroids': self.centroids,
+                'total': self.total, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        sketch = cls(state['compression'])
+        sketch.centroids = [tuple(c) for c in state['centroids']]
+        sketch.total = state['total']
+        sketch.min = state['min']
+        sketch.max = state['max']
+        return sketch
+
+
+# ========================================
+# Approximate Statistics Manager
+# ========================================
+
+class ApproximateStatistics:
+    """Keeps the sketches of one database up to date and prints the report"""
+
+    STATE_KEY = 'statistics'
+    # sketch_state row with the highest sketch_log change_id pruned so far
+    PRUNED_KEY = 'log_pruned'
+    # Rebuild at startup once this share of a table's rows was removed
+    REBUILD_FRACTION = 0.1
+    LOG_COLUMNS = 'table_name, sign, age, brand, model, year, color, owner_id'
+    LOG_VALUES = {
+        'persons': "'persons', {sign}, {row}.age, NULL, NULL, NULL, NULL, NULL",
+        'cars': "'cars', {sign}, NULL, {row}.brand, {row}.model, {row}.year, {row}.color, {row}.owner_id",
+    }
+    # trigger -> (event, table, (sign, row) pairs written to sketch_log);
+    # only columns the sketches use are watched, so an email change is free
+    CHANGE_TRIGGERS = {
+        'sketch_log_persons_update': ('AFTER UPDATE OF age ON persons WHEN OLD.age IS NOT NEW.age',
+                                      'persons', ((-1, 'OLD'), (1, 'NEW'))),
+        'sketch_log_persons_delete': ('AFTER DELETE ON persons', 'persons', ((-1, 'OLD'),)),
+        'sketch_log_cars_update': ('AFTER UPDATE OF brand, model, year, color, owner_id ON cars WHEN '
+                                   'OLD.brand IS NOT NEW.brand OR OLD.model IS NOT NEW.model OR '
+                                   'OLD.year IS NOT NEW.year OR OLD.color IS NOT NEW.color OR '
+                                   'OLD.owner_id IS NOT NEW.owner_id',
+                                   'cars', ((-1, 'OLD'), (1, 'NEW'))),
+        'sketch_log_cars_delete': ('AFTER DELETE ON cars', 'cars', ((-1, 'OLD'),)),
+    }
+    SKETCHES = {
+        'brand_distinct': HyperLogLog, 'model_distinct': HyperLogLog, 'owner_distinct': HyperLogLog,
+        'brand_freq': CountMinSketch, 'color_freq': CountMinSketch,
+        'brand_top': SpaceSaving, 'color_top': SpaceSaving,
+        'age_quantiles': TDigest, 'year_quantiles': TDigest,
+    }
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.reset()
+
+    def reset(self):
+        self.sketches = {name: cls() for name, cls in self.SKETCHES.items()}
+        self.persons = 0
+        self.cars = 0
+        self.owned_cars = 0
+        self.age_sum = 0
+        # Last sketch_log change_id applied (None: unknown)
+        self.changes = None
+        # Removed rows the HyperLogLogs and t-digests still hold
+        self.unremoved = {'persons': 0, 'cars': 0}
+
+    # ---------- feeding ----------
+
+    def observe(self, table, rows):
+        """DatabaseManager observer: rows are in Statements column order"""
+        if table == 'persons':
+            self.observe_persons(rows)
+        elif table == 'cars':
+            self.observe_cars(rows)
+
+    def observe_persons(self, rows):
+        ages = Counter(row[2] for row in rows)
+        for age, count in ages.items():
+            self.sketches['age_quantiles'].add(age, count)
+            self.age_sum += age * count
+        self.persons += sum(ages.values())
+
+    def observe_cars(self, rows):
+        s = self.sketches
+        # Aggregate first: the sketches are then updated once per distinct value
+        brands = Counter(row[1] for row in rows)
+        colors = Counter(row[4] for row in rows)
+        for brand, count in brands.items():
+            s['brand_distinct'].add(brand)
+            s['brand_freq'].add(brand, count)
+            s['brand_top'].add(brand, count)
+        for color, count in colors.items():
+            s['color_freq'].add(color, count)
+            s['color_top'].add(color, count)
+        for model in set(row[2] for row in rows):
+            s['model_distinct'].add(model)
+        for year, count in Counter(row[3] for row in rows).items():
+            s['year_quantiles'].add(year, count)
+        owners = [row[5] for row in rows if row[5] is not None]
+        for owner_id in set(owners):
+            s['owner_distinct'].add(owner_id)
+        self.owned_cars += len(owners)
+        self.cars += sum(brands.values())
+
+    def remove_persons(self, rows):
+        ages = Counter(row[2] for row in rows)
+        for age, count in ages.items():
+            self.age_sum -= age * count
+        self.persons -= len(rows)
+        self.unremoved['persons'] += len(rows)
+
+    def remove_cars(self, rows):
+        s = self.sketches
+        for brand, count in Counter(row[1] for row in rows).items():
+            # Count-Min stays an overestimate when the true count drops too
+            s['brand_freq'].add(brand, -count)
+            s['brand_top'].remove(brand, count)
+        for color, count in Counter(row[4] for row in rows).items():
+            s['color_freq'].add(color, -count)
+            s['color_top'].remove(color, count)
+        self.owned_cars -= sum(1 for row in rows if row[5] is not None)
+        self.cars -= len(rows)
+        self.unremoved['cars'] += len(rows)
+
+    def changed(self, table):
+        """DatabaseManager observer: rows were updated or deleted (and committed)"""
+        self.apply_changes()
+
+    def apply_changes(self):
+        """Apply the updates and deletes logged since the sketches were built"""
+        if self.changes is None or self.pruned_changes() > self.changes:
+            # The log no longer holds everything these sketches miss
+            self.rebuild()
+            return
+        log = self.db_manager.execute(
+            f'SELECT change_id, {self.LOG_COLUMNS} FROM sketch_log WHERE change_id > ? ORDER BY change_id',
+            (self.changes,), fetch='all')
+        if not log:
+            return
+        added = {'persons': [], 'cars': []}
+        removed = {'persons': [], 'cars': []}
+        for change_id, table, sign, age, *car in log:
+            # Same column order as the rows observe() gets
+            row = (None, None, age, None) if table == 'persons' else (None, *car)
+            (added if sign > 0 else removed)[table].append(row)
+        self.observe_persons(added['persons'])
+        self.observe_cars(added['cars'])
+        self.remove_persons(removed['persons'])
+        self.remove_cars(removed['cars'])
+        self.changes = log[-1][0]
+
+    def needs_rebuild(self):
+        """True when removed rows are a large share of what the HyperLogLogs and t-digests hold"""
+        return any(self.unremoved[table] > self.REBUILD_FRACTION * max(count, 1)
+                   for table, count in (('persons', self.persons), ('cars', self.cars)))
+
+    def attach(self):
+        """Receive every insert and change made through the DatabaseManager"""
+        if self not in self.db_manager.observers:
+            self.db_manager.observers.append(self)
+        return self
+
+    # ---------- persistence ----------
+
+    def create_table(self):
+        """Create sketch_state, sketch_log and the triggers that fill the log.
+
+        Returns False if the triggers had to be created, i.e. earlier
+        updates and deletes were not logged.
+        """
+        db = self.db_manager
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS sketch_state (
+                name TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            )
+        ''')
+        # AUTOINCREMENT: ids must keep growing after the log is pruned
+        db.execute('''
+            CREATE TABLE IF NOT EXISTS sketch_log (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                sign INTEGER NOT NULL,
+                age INTEGER,
+                brand TEXT,
+                model TEXT,
+                year INTEGER,
+                color TEXT,
+                owner_id INTEGER
+            )
+        ''')
+        db.execute("INSERT OR IGNORE INTO sketch_state (name, state) VALUES (?, '0')", (self.PRUNED_KEY,))
+        existing = db.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'sketch_log_%'",
+            fetch='one')[0]
+        for name, (event, table, images) in self.CHANGE_TRIGGERS.items():
+            values = ', '.join('(' + self.LOG_VALUES[table].format(sign=sign, row=row) + ')'
+                               for sign, row in images)
+            db.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {name} {event}
+                BEGIN INSERT INTO sketch_log ({self.LOG_COLUMNS}) VALUES {values}; END
+            ''')
+        db.commit()
+        return existing == len(self.CHANGE_TRIGGERS)
+
+    def pruned_changes(self):
+        """Highest change_id already deleted from sketch_log"""
+        return int(self.db_manager.execute('SELECT state FROM sketch_state WHERE name = ?',
+                                           (self.PRUNED_KEY,), fetch='one')[0])
+
+    def last_change(self):
+        """Highest change_id ever written to sketch_log"""
+        row = self.db_manager.execute("SELECT seq FROM sqlite_sequence WHERE name = 'sketch_log'",
+                                      fetch='one')
+        return row[0] if row else 0
+
+    def save(self):
+        """Save the sketches and prune the log rows they include"""
+        self.create_table()
+        self.apply_changes()
+        state = {
+            'persons': self.persons, 'cars': self.cars,
+            'owned_cars': self.owned_cars, 'age_sum': self.age_sum,
+            'changes': self.changes, 'unremoved': self.unremoved,
+            'sketches': {name: sketch.to_state() for name, sketch in self.sketches.items()},
+        }
+        db = self.db_manager
+        db.execute('INSERT OR REPLACE INTO sketch_state (name, state) VALUES (?, ?)',
+                   (self.STATE_KEY, json.dumps(state)))
+        db.execute('DELETE FROM sketch_log WHERE change_id <= ?', (self.changes,))
+        db.execute('UPDATE sketch_state SET state = MAX(CAST(state AS INTEGER), ?) WHERE name = ?',
+                   (self.changes, self.PRUNED_KEY))
+        db.commit()
+
+    def load(self):
+        """Load the saved sketches; False if there are none"""
+        self.create_table()
+        row = self.db_manager.execute('SELECT state FROM sketch_state WHERE name = ?',
+                                      (self.STATE_KEY,), fetch='one')
+        if not row:
+            return False
+        state = json.loads(row[0])
+        self.persons, self.cars = state['persons'], state['cars']
+        self.owned_cars, self.age_sum = state['owned_cars'], state['age_sum']
+        self.changes = state.get('changes')
+        self.unremoved = state.get('unremoved', {'persons': 0, 'cars': 0})
+        self.sketches = {name: self.SKETCHES[name].from_state(s) for name, s in state['sketches'].items()}
+        return True
+
+    def rebuild(self, chunk_size=50000):
+        """Recompute every sketch by scanning persons and cars"""
+        # Read before the scan: changes logged during it are applied again,
+        # which only makes the sketches overestimate
+        self.create_table()
+        changes = self.last_change()
+        self.reset()
+        cursor = self.db_manager.connection.cursor()
+        for table, columns in (('persons', 'person_id, name, age, email'),
+                               ('cars', 'car_id, brand, model, year, color, owner_id')):
+            cursor.execute(f'SELECT {columns} FROM {table}')
+            while rows := cursor.fetchmany(chunk_size):
+                self.observe(table, rows)
+        cursor.close()
+        self.changes = changes
+        self.save()
+
+    def load_or_rebuild(self):
+        """Use the saved sketches plus the change log, unless other processes
+        inserted rows or too many removed rows are still in the sketches"""
+        logged = self.create_table()
+        persons = self.db_manager.execute('SELECT COUNT(*) FROM persons', fetch='one')[0]
+        cars = self.db_manager.execute('SELECT COUNT(*) FROM cars', fetch='one')[0]
+        if logged and self.load():
+            self.apply_changes()
+        if (not logged or self.changes is None or self.needs_rebuild()
+                or (self.persons, self.cars) != (persons, cars)):
+            print("🔄 Rebuilding statistics sketches...")
+            self.rebuild()
+        return self.attach()
+
+    # ---------- report ----------
+
+    def print_statistics(self, top=10):
+        """Print the approximate report with its error bounds.
+
+        Updates and deletes since the last report are applied first; only
+        sketches that were never built (or whose log was pruned by another
+        process) are rebuilt here.
+        """
+        start = time.perf_counter()
+        self.apply_changes()
+        s = self.sketches
+        lines = []
+        # Removed rows the t-digests still hold shift every rank by at most this share
+        stale = {table: self.unremoved[table] / max(total, 1)
+                 for table, total in (('persons', s['age_quantiles'].total),
+                                      ('cars', s['year_quantiles'].total))}
+        if any(self.unremoved.values()):
+            lines.append(f"\nℹ️  Distinct counts, quantiles and ranges still include "
+                         f"{self.unremoved['persons']} removed persons and {self.unremoved['cars']} removed cars")
+
+        if self.persons:
+            ages = s['age_quantiles']
+            lines.append("\n👥 Persons Age Distribution:")
+            lines.append(f"   Total persons: {self.persons}")
+            lines.append(f"   Age range: {ages.min} - {ages.max}")
+            lines.append(f"   Average age: {self.age_sum / self.persons:.1f}")
+            for q in (0.5, 0.9, 0.99):
+                lines.append(f"   p{int(q * 100)} age ≈ {ages.quantile(q):.1f} "
+                             f"(±{ages.rank_error(q) + stale['persons']:.2%} rank)")
+
+        if self.cars:
+            hll = s['brand_distinct']
+            lines.append(f"\n🚗 Car Brand Distribution (≈{hll.count():.0f} brands, "
+                         f"≈{s['model_distinct'].count():.0f} models, ±{hll.relative_error:.1%}):")
+            bound = s['brand_freq'].error_bound
+            for brand in s['brand_top'].top(top):
+                estimate = s['brand_freq'].estimate(brand)
+                lines.append(f"   {brand}: ≈{estimate} cars ({max(0, estimate - bound):.0f}-{estimate})")
+
+            bound = s['color_freq'].error_bound
+            lines.append("\n🎨 Car Color Distribution:")
+            for color in s['color_top'].top(top):
+                estimate = s['color_freq'].estimate(color)
+                lines.append(f"   {color}: ≈{estimate} cars ({max(0, estimate - bound):.0f}-{estimate})")
+
+            years = s['year_quantiles']
+            lines.append(f"\n📅 Car years: median ≈ {years.quantile(0.5):.0f} "
+                         f"(±{years.rank_error(0.5) + stale['cars']:.2%} rank), range {years.min} - {years.max}")
+
+            owners = s['owner_distinct'].count()
+            if owners:
+                lines.append(f"\n📈 Average cars per person: ≈{self.owned_cars / owners:.2f} "
+                             f"(±{s['owner_distinct'].relative_error:.1%})")
+            popular = s['brand_top'].top(1)
+            if popular:
+                lines.append(f"\n⭐ Most popular brand: {popular[0]} "
+                             f"(≈{s['brand_freq'].estimate(popular[0])} cars)")
+
+        elapsed = (time.perf_counter() - start) * 1000
+        print("\n" + "="*60)
+        print(f"📊 APPROXIMATE STATISTICS REPORT ({elapsed:.1f}ms)")
+        print("="*60)
+        print("\n".join(lines))
+        print("="*60 + "\n")
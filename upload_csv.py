@@ -1,26 +1,509 @@
-from fastapi import FastAPI, File, UploadFile
-from io import StringIO
-import pandas as pd
+from fastapi import FastAPI, File, HTTPException, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from concurrent.futures import BrokenExecutor, Future
+from itertools import chain, islice
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import uuid
 
 app = FastAPI()
 
-@app.post("/upload-csv/")
-async def upload_csv(file: UploadFile = File(...)):
-    # Read the file contents as bytes
-    contents = await file.read()
+# Job queue settings
+MAX_WORKERS = os.cpu_count() or 1
+MAX_QUEUED_JOBS = 16          # queued + running jobs before uploads are refused
+CHUNK_ROWS = 50_000           # rows parsed and stored per step
+UPLOAD_CHUNK_BYTES = 1 << 20  # bytes read from the request per step
+UPLOADS_DB = "uploads.db"
+MAX_JOB_HISTORY = 1000        # finished jobs kept for GET /jobs/{id}
+CACHE_DIR = "upload_cache"
+CACHE_MAX_BYTES = 64 << 20    # disk budget of the upload cache
+FAST_PATH_MAX_BYTES = 4 << 20 # "auto" parses smaller uploads with the csv module...
+FAST_PATH_MAX_COLUMNS = 32    # ...when they are also this narrow
+TYPE_SAMPLE_ROWS = 100        # rows looked at to pick column types
+MAX_INLINE_PARSES = 4         # fast-path uploads parsed at the same time
 
-    # Decode the bytes to a string
-    csv_string = contents.decode("utf-8")
 
-    # Use StringIO to treat the string as a file-like object
-    csv_buffer = StringIO(csv_string)       
-    # Read the CSV into a pandas DataFrame
-    df = pd.read_csv(csv_buffer)
+class UploadCache:
+    """Size-bounded LRU of ingestion results on disk, keyed by the upload's content hash"""
 
-    # You can now process the DataFrame (e.g., print it, save to DB, etc.)
-    print(df.head())
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
 
-    # Close the buffer and the uploaded file
-    csv_buffer.close()
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, digest):
+        """Return the stored result, marking it as recently used"""
+        try:
+            with open(self.path(digest), "r", encoding="utf-8") as f:
+                result = json.load(f)
+            os.utime(self.path(digest))
+            return result
+        except (OSError, ValueError):
+            return None
+
+    def put(self, digest, result):
+        """Store a result (atomically, several workers may write at once)"""
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.path(digest)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, self.path(digest))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its budget"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+cache = UploadCache(CACHE_DIR, CACHE_MAX_BYTES)
+cache_metrics = {"uploads": 0, "hits": 0, "bytes_received": 0, "bytes_saved": 0}
+
+# job_id -> {"filename", "table", "submitted", "future", "digest"}
+jobs = {}
+# content hash -> job_id of the job that is ingesting it right now
+jobs_by_digest = {}
+# Caps the inline (stdlib) parses running in the request thread pool
+inline_parses = asyncio.Semaphore(MAX_INLINE_PARSES)
+# Created on first upload so importing this module stays cheap
+executor = None
+manager = None
+progress = None
+
+
+def get_executor():
+    """Start the worker pool and the shared progress dict on first use"""
+    global executor, manager, progress
+    if executor is None:
+        # multiprocessing is only imported once a job needs a worker
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import Manager
+
+        manager = Manager()
+        progress = manager.dict()
+        executor = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+    return executor
+
+
+def reset_executor():
+    """Drop a broken worker pool; the next get_executor() call starts a new one"""
+    global executor, manager, progress
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if manager is not None:
+        manager.shutdown()
+    executor = manager = progress = None
+    # No worker is left to finish its staging table
+    conn = sqlite3.connect(UPLOADS_DB, timeout=60)
+    try:
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                    "AND name GLOB 'staging_*'").fetchall():
+            conn.execute(f'DROP TABLE "{name}"')
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def discard(path):
+    """Remove a temporary upload if it is still there"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def table_name(filename):
+    """Turn an uploaded file name into a safe SQLite table name"""
+    stem = os.path.splitext(os.path.basename(filename or "upload"))[0]
+    name = re.sub(r"\W+", "_", stem).strip("_") or "upload"
+    return f"csv_{name}"
+
+
+def publish_staging(conn, staging, table):
+    """Move a fully ingested staging table into its target in one transaction"""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{staging}")')]
+    if not columns:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                          (table,)).fetchone()
+    if exists:
+        names = ", ".join('"' + c.replace('"', '""') + '"' for c in columns)
+        conn.execute(f'INSERT INTO "{table}" ({names}) SELECT {names} FROM "{staging}"')
+        conn.execute(f'DROP TABLE "{staging}"')
+    else:
+        conn.execute(f'ALTER TABLE "{staging}" RENAME TO "{table}"')
+    conn.commit()
+
+
+def ingest_csv(job_id, path, table, progress, digest):
+    """Worker process: parse the CSV in chunks and append it to SQLite"""
+    # pandas is heavy to import; only the parsing path needs it
+    import pandas as pd
+
+    state = {"rows": 0, "started": time.time(), "finished": None, "errors": []}
+    progress[job_id] = state
+    # Chunks are committed to a staging table so the write lock is held
+    # briefly; the target only sees the upload once every chunk parsed, so a
+    # failed job can be retried without inserting its first chunks twice
+    # (upload tables all start with csv_, so staging_ names cannot clash)
+    staging = f"staging_{job_id}"
+    # Other workers may be writing to the same file, so wait for the lock
+    conn = sqlite3.connect(UPLOADS_DB, timeout=60)
+    try:
+        for chunk in pd.read_csv(path, chunksize=CHUNK_ROWS):
+            chunk.to_sql(staging, conn, if_exists="append", index=False)
+            conn.commit()
+            state["rows"] += len(chunk)
+            # Manager dicts only see a change when the value is assigned again
+            progress[job_id] = state
+        publish_staging(conn, staging, table)
+    except Exception as e:
+        state["errors"].append(str(e))
+        conn.rollback()
+        conn.execute(f'DROP TABLE IF EXISTS "{staging}"')
+        conn.commit()
+    finally:
+        conn.close()
+        os.remove(path)
+        state["finished"] = time.time()
+        progress[job_id] = state
+    if not state["errors"]:
+        cache.put(digest, {"table": table, "rows": state["rows"], "job_id": job_id})
+
+
+def to_number(cast):
+    """Converter that keeps the text when a value does not parse"""
+    def convert(value):
+        if value == "":
+            return None
+        try:
+            return cast(value)
+        except ValueError:
+            return value
+    return convert
+
+
+CONVERTERS = {"INTEGER": to_number(int), "REAL": to_number(float), "TEXT": lambda v: None if v == "" else v}
+
+
+def infer_column_types(columns, sample):
+    """Pick INTEGER, REAL or TEXT per column from a sample of rows"""
+    types = []
+    for i in range(len(columns)):
+        values = [row[i] for row in sample if i < len(row) and row[i] != ""]
+        for sql_type, cast in (("INTEGER", int), ("REAL", float)):
+            try:
+                for value in values:
+                    cast(value)
+            except ValueError:
+                continue
+            if values:
+                types.append(sql_type)
+                break
+        else:
+            types.append("TEXT")
+    return types
+
+
+def ingest_csv_stdlib(binary_file, table):
+    """Lightweight path: stream the upload through csv.reader straight into SQLite"""
+    binary_file.seek(0)
+    # utf-8-sig also strips the BOM that Excel puts in front of CSV exports
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text)
+        columns = next(reader, None)
+        if not columns:
+            return {"table": table, "rows": 0, "columns": {}}
+        sample = list(islice(reader, TYPE_SAMPLE_ROWS))
+        types = infer_column_types(columns, sample)
+        converters = [CONVERTERS[t] for t in types]
+        width = len(columns)
+
+        def rows():
+            for row in chain(sample, reader):
+                if not row:
+                    continue
+                row = (row + [""] * width)[:width]
+                yield tuple(convert(value) for convert, value in zip(converters, row))
+
+        quoted = ['"' + c.replace('"', '""') + '"' for c in columns]
+        conn = sqlite3.connect(UPLOADS_DB, timeout=60)
+        try:
+            # sqlite3 would commit the CREATE on its own; in one explicit
+            # transaction a row failing later (close() rolls it back) leaves
+            # no empty table behind
+            conn.execute("BEGIN")
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" '
+                         f'({", ".join(f"{c} {t}" for c, t in zip(quoted, types))})')
+            cursor = conn.executemany(f'INSERT INTO "{table}" ({", ".join(quoted)}) '
+                                      f'VALUES ({", ".join("?" * width)})', rows())
+            count = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return {"table": table, "rows": count, "columns": dict(zip(columns, types))}
+    finally:
+        # Leave the upload's own file open for FastAPI to clean up
+        text.detach()
+
+
+def hash_file(binary_file):
+    """SHA-256 and size of a file object, read in chunks from the start"""
+    binary_file.seek(0)
+    sha = hashlib.sha256()
+    size = 0
+    while chunk := binary_file.read(UPLOAD_CHUNK_BYTES):
+        sha.update(chunk)
+        size += len(chunk)
+    return sha.hexdigest(), size
+
+
+def active_jobs():
+    """Number of jobs that are queued or still running"""
+    return sum(1 for job in jobs.values() if not job["future"].done())
+
+
+def forget_old_jobs():
+    """Drop the oldest finished jobs beyond MAX_JOB_HISTORY"""
+    finished = [job_id for job_id, job in jobs.items() if job["future"].done()]
+    for job_id in finished[:max(0, len(finished) - MAX_JOB_HISTORY)]:
+        del jobs[job_id]
+        if progress is not None:
+            progress.pop(job_id, None)
+
+
+def job_finished(job_id, digest):
+    """The content is no longer being ingested (runs on the event loop)"""
+    if jobs_by_digest.get(digest) == job_id:
+        del jobs_by_digest[digest]
+
+
+def cached_upload(digest, size, filename):
+    """Response for content already ingested or being ingested right now, else None"""
+    cached = cache.get(digest)
+    # Read once: the entry may be released between two lookups
+    job_id = jobs_by_digest.get(digest)
+    if cached is None and job_id is None:
+        return None
+    cache_metrics["hits"] += 1
+    cache_metrics["bytes_saved"] += size
+    if cached is not None:
+        return {"job_id": cached["job_id"], "filename": filename, "status": "done",
+                "cached": True, "table": cached["table"], "rows_processed": cached["rows"]}
+    return {"job_id": job_id, "filename": filename, "status": "queued", "cached": True}
+
+
+def use_stdlib_parser(binary_file, parser):
+    """Decide between the csv-module fast path and pandas"""
+    if parser != "auto":
+        return parser == "stdlib"
+    binary_file.seek(0, os.SEEK_END)
+    size = binary_file.tell()
+    binary_file.seek(0)
+    header = binary_file.readline().decode("utf-8", errors="replace")
+    binary_file.seek(0)
+    columns = next(csv.reader([header]), [])
+    return size <= FAST_PATH_MAX_BYTES and len(columns) <= FAST_PATH_MAX_COLUMNS
+
+
+@app.post("/upload-csv/", status_code=202)
+async def upload_csv(response: Response, file: UploadFile = File(...), parser: str = "auto"):
+    if parser not in ("auto", "stdlib", "pandas"):
+        raise HTTPException(status_code=400, detail="parser must be auto, stdlib or pandas")
+
+    if use_stdlib_parser(file.file, parser):
+        # Finished inline, so this is a plain 200 rather than 202 Accepted
+        response.status_code = 200
+        return await upload_csv_stdlib(file)
+
+    # Stream the upload to a temporary file the worker process can read,
+    # hashing it on the way so repeated uploads can be recognised
+    sha = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".csv") as tmp:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            sha.update(chunk)
+            size += len(chunk)
+            tmp.write(chunk)
     await file.close()
-    return {"filename": file.filename, "message": "CSV processed successfully!"}
\ No newline at end of file
+    digest = sha.hexdigest()
+    cache_metrics["uploads"] += 1
+    cache_metrics["bytes_received"] += size
+
+    cached = cached_upload(digest, size, file.filename)
+    if cached is not None:
+        os.remove(tmp.name)
+        return cached
+
+    # Backpressure: refuse new work instead of letting the queue grow forever.
+    # Checked after the lookup above, so re-uploads are still answered under load.
+    if active_jobs() >= MAX_QUEUED_JOBS:
+        os.remove(tmp.name)
+        raise HTTPException(status_code=503, detail="Too many uploads in progress, try again later",
+                            headers={"Retry-After": "5"})
+
+    job_id = uuid.uuid4().hex
+    table = table_name(file.filename)
+    try:
+        try:
+            future = get_executor().submit(ingest_csv, job_id, tmp.name, table, progress, digest)
+        except BrokenExecutor:
+            # BrokenProcessPool (caught by its base class, which does not
+            # import multiprocessing): a worker died, e.g. out of memory on a
+            # big upload, and took the pool with it. Start a new one instead
+            # of failing every upload until a restart.
+            reset_executor()
+            future = get_executor().submit(ingest_csv, job_id, tmp.name, table, progress, digest)
+    except Exception:
+        os.remove(tmp.name)
+        raise
+    # The worker removes the file, unless it died or never started
+    future.add_done_callback(lambda _: discard(tmp.name))
+    jobs[job_id] = {"filename": file.filename, "table": table, "submitted": time.time(),
+                    "future": future, "digest": digest}
+    jobs_by_digest[digest] = job_id
+    # Done callbacks of process-pool futures run on the executor's thread;
+    # jobs_by_digest is only changed on the event loop
+    loop = asyncio.get_running_loop()
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(job_finished, job_id, digest))
+    forget_old_jobs()
+    return {"job_id": job_id, "filename": file.filename, "status": "queued", "cached": False}
+
+
+async def upload_csv_stdlib(file):
+    """Small, narrow uploads: parse and store them inline without pandas or a worker"""
+    digest, size = await run_in_threadpool(hash_file, file.file)
+    cache_metrics["uploads"] += 1
+    cache_metrics["bytes_received"] += size
+
+    # Jobs of either path count as in flight
+    cached = cached_upload(digest, size, file.filename)
+    if cached is not None:
+        await file.close()
+        return cached
+
+    # Inline parses hold a request thread each: refuse instead of piling them up
+    if inline_parses.locked():
+        await file.close()
+        raise HTTPException(status_code=503, detail="Too many uploads in progress, try again later",
+                            headers={"Retry-After": "5"})
+
+    # Registered before any await so a concurrent identical upload finds it above
+    job_id = uuid.uuid4().hex
+    table = table_name(file.filename)
+    future = Future()
+    jobs[job_id] = {"filename": file.filename, "table": table, "submitted": time.time(),
+                    "future": future, "digest": digest, "inline": True}
+    jobs_by_digest[digest] = job_id
+    try:
+        async with inline_parses:
+            result = await run_in_threadpool(ingest_csv_stdlib, file.file, table)
+        # Cached before the digest is released, so there is no window for a duplicate
+        cache.put(digest, {"table": table, "rows": result["rows"], "job_id": job_id})
+        # Kept as a finished job so GET /jobs/{id} works for both paths
+        jobs[job_id]["result"] = result
+        future.set_result(None)
+    except (csv.Error, UnicodeDecodeError, sqlite3.Error) as e:
+        future.set_exception(e)
+        raise HTTPException(status_code=400, detail=f"Could not ingest CSV: {e}")
+    finally:
+        if not future.done():
+            future.set_exception(RuntimeError("upload was not ingested"))
+        job_finished(job_id, digest)
+        await file.close()
+    forget_old_jobs()
+    return {"job_id": job_id, "filename": file.filename, "status": "done", "cached": False,
+            "parser": "stdlib", "table": table, "rows_processed": result["rows"],
+            "columns": result["columns"]}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if "result" in job:
+        return {"job_id": job_id, "filename": job["filename"], "table": job["table"],
+                "status": "done", "parser": "stdlib", "rows_processed": job["result"]["rows"],
+                "errors": []}
+    if job.get("inline") and not job["future"].done():
+        return {"job_id": job_id, "filename": job["filename"], "table": job["table"],
+                "status": "running", "parser": "stdlib", "rows_processed": 0, "errors": []}
+
+    state = progress.get(job_id) if progress is not None else None
+    # A worker that died (or a pool that was reset) never reports back
+    if state is None or (state["finished"] is None and job["future"].done()):
+        status = "failed" if job["future"].done() else "queued"
+        if status == "failed":
+            errors = ["cancelled"] if job["future"].cancelled() else [str(job["future"].exception())]
+        else:
+            errors = []
+        return {"job_id": job_id, "filename": job["filename"], "status": status,
+                "rows_processed": 0, "rows_per_second": 0.0, "errors": errors}
+
+    end = state["finished"] or time.time()
+    elapsed = end - state["started"]
+    if state["finished"] is None:
+        status = "running"
+    else:
+        status = "failed" if state["errors"] else "done"
+    return {
+        "job_id": job_id,
+        "filename": job["filename"],
+        "table": job["table"],
+        "status": status,
+        "rows_processed": state["rows"],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(state["rows"] / elapsed, 1) if elapsed > 0 else 0.0,
+        "errors": state["errors"],
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Upload cache metrics in Prometheus text format"""
+    uploads = cache_metrics["uploads"]
+    hit_ratio = cache_metrics["hits"] / uploads if uploads else 0.0
+    lines = [
+        "# TYPE upload_cache_requests_total counter",
+        f"upload_cache_requests_total {uploads}",
+        "# TYPE upload_cache_hits_total counter",
+        f"upload_cache_hits_total {cache_metrics['hits']}",
+        "# TYPE upload_cache_hit_ratio gauge",
+        f"upload_cache_hit_ratio {hit_ratio}",
+        "# TYPE upload_bytes_received_total counter",
+        f"upload_bytes_received_total {cache_metrics['bytes_received']}",
+        "# TYPE upload_cache_bytes_saved_total counter",
+        f"upload_cache_bytes_saved_total {cache_metrics['bytes_saved']}",
+        "# TYPE upload_jobs_active gauge",
+        f"upload_jobs_active {active_jobs()}",
+    ]
+    return "\n".join(lines) + "\n"